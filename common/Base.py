@@ -8,11 +8,14 @@
 #   Copyright by Author. All rights reserved. Not for reuse without
 #   express permissions.
 #
-import sys, gc, json, time, logging, random, copy
+import sys, gc, json, time, logging, random, copy, tempfile
+import cPickle as pickle
 import requests
 from requests.exceptions import HTTPError, URLRequired
-from threading import Thread, Semaphore
-from infx.common.AsyncTimer import AsyncTimer
+from collections import deque
+from threading import Thread, Semaphore, Condition
+from sochi.common.AsyncTimer import AsyncTimer
+from sochi.common.SessionPool import get_session, drop_sessions
 
 
 class Base(Thread):
@@ -27,7 +30,7 @@ class Base(Thread):
         requests_logger = logging.getLogger("requests")
         requests_logger.setLevel("ERROR")
         
-        self.requests_session = None
+        self.requests_session = None # own session, None uses the shared ones
         self.logger = None
         if( logger ):
             self.logger = logger
@@ -37,9 +40,10 @@ class Base(Thread):
                                 level=logging.INFO)
             self.logger = logging.getLogger(__name__)
         self.async_timer = None
-        self.msem = Semaphore(1)  # semaphore for the message buffer
+        self.mcond = Condition()  # guards the message buffer, signals new messages,
+                                  # finished requests and the thread stopping
         self.rsem = Semaphore(1)  # semaphore for the request activity
-        self.message_queue = []
+        self.message_queue = deque()
         self.pqsem = Semaphore(1) # semaphore for queue of prior requests
         self.prior_requests = []  # a queue/list of prior requests
         self.rqsem = Semaphore(1) # semaphore to prevent changes to the request_data
@@ -47,8 +51,18 @@ class Base(Thread):
         self.headers = {}
         self.max_prior_requests = 25
         self.max_queue_len = 8000 # max message queue length
+        self.queue_policy = "drop" # what put_message() does when the queue is full
+        self.spill_file = None    # overflow file for the "spill" policy
+        self.spill_fname = None
+        self.spill_read = 0       # offset of the next spilled message to read
+        self.spilled = 0          # messages in the overflow file now
+        self.dropped_messages = 0
+        self.spilled_messages = 0
+        self.blocked_puts = 0
         self.querying = False
         self.running = False
+        self.requests_started = 0 # start_request() calls
+        self.requests_done = 0    # requests the thread has finished
         self.my_receiver = None
         self.request_pages = 10   # when paged, how many pages to request
         self.domain = None        # the domain, url prefix, for this request
@@ -59,25 +73,29 @@ class Base(Thread):
         self.auth_obj = None
         self.debug_output = False
 
-        self.reset_requests_session()
+    ##
+    # Returns the http session for a request to url. Unless this object
+    # was given a session of its own, that is this thread's session over
+    # the connections shared by all objects in the process for the host
+    # of url (see SessionPool).
+    #
+    def get_requests_session(self, url=None):
+        if( self.requests_session ):
+            return self.requests_session
+        return get_session(url=(url or self.domain))
 
     ##
-    # resets the requests http sessions for this object
+    # resets the requests http sessions for this object, after a
+    # connection error. A shared session is dropped from the pool, so the
+    # next request to that host starts with new connections.
     #
     def reset_requests_session(self):
         if( self.requests_session ):
             self.requests_session.close()
             self.requests_session = None
             gc.collect()
-        self.requests_session = requests.Session()
-        r_a1 = requests.adapters.HTTPAdapter(pool_connections=100,
-                                             pool_maxsize=100,
-                                             max_retries=3)
-        r_a2 = requests.adapters.HTTPAdapter(pool_connections=100, 
-                                             pool_maxsize=100,
-                                             max_retries=3)
-        self.requests_session.mount('http://', r_a1)
-        self.requests_session.mount('https://', r_a2)
+        else:
+            drop_sessions(url=self.domain)
         if( self.auth_obj ):
             self.auth_obj.reset_requests_session()
         return
@@ -211,6 +229,16 @@ class Base(Thread):
         self.rqsem.release()
         return
 
+    ##
+    # Returns a copy of the request info built by set_request(), a request
+    # descriptor that can be handed to a RequestExecutor
+    #
+    def get_request_data(self):
+        self.rqsem.acquire()
+        request = copy.copy(self._request_data)
+        self.rqsem.release()
+        return request
+
     ##
     # Pushes the information of the request onto the prior_requests queue
     #
@@ -304,12 +332,13 @@ class Base(Thread):
 
     ##
     # Sets the authorization object for this object, if this is
-    # not set, then this is not handled as an authenticated request
+    # not set, then this is not handled as an authenticated request.
+    # The shared sessions made with the login's old keys are dropped.
     #
     def set_auth_obj(self, obj=None):
         self.auth_obj = obj
         if( self.auth_obj ):
-            self.auth_obj.reset_requests_session()
+            self.auth_obj.drop_stale_sessions()
 
     ##
     # returns the authorization object for this object
@@ -340,11 +369,59 @@ class Base(Thread):
     def set_pages_to_request(self, r=25):
         self.request_pages = r
 
+    ##
+    # The querying flag is set by make_request() in the subclasses. When it
+    # changes, threads blocked in get_message() are woken so they can see
+    # that the query has finished.
+    #
+    def _get_querying(self):
+        return self._querying
+
+    def _set_querying(self, q=False):
+        self.mcond.acquire()
+        self._querying = q
+        self.mcond.notify_all()
+        self.mcond.release()
+
+    querying = property(_get_querying, _set_querying)
+
     ##
     # If this is in the process of making a query, then this is True.
+    # A request that was started but that the thread has not picked up
+    # yet counts as in process.
     #
     def query_in_process(self):
-        return self.querying
+        return self.querying or (self.running and
+                                 self.requests_done<self.requests_started)
+
+    ##
+    # Waits on mcond while busy() is true, for at most timeout seconds
+    # when one is given. The caller holds mcond. Returns False if the
+    # wait timed out. Python 2 can't interrupt an untimed lock wait with
+    # Ctrl-C, so an untimed wait is done in one second slices.
+    #
+    def _wait_while(self, busy=None, timeout=None):
+        end = None
+        if( timeout is not None ):
+            end = time.time()+timeout
+        while( busy() ):
+            if( end is None ):
+                self.mcond.wait(1.0)
+            else:
+                remaining = end-time.time()
+                if( remaining<=0 ):
+                    return False
+                self.mcond.wait(remaining)
+        return True
+
+    ##
+    # Wakes every thread waiting on mcond, so they check again whether
+    # the thread is still running
+    #
+    def _notify_waiters(self):
+        self.mcond.acquire()
+        self.mcond.notify_all()
+        self.mcond.release()
 
     ##
     # Status of the query thread
@@ -390,51 +467,156 @@ class Base(Thread):
         self.last_throttle_check = throttle_check
         return waits
 
+    ##
+    # Sets what put_message() does with a message when the queue already
+    # holds max_queue_len messages:
+    #   "drop"        - log it and drop the new message (the old behaviour)
+    #   "drop_oldest" - drop the oldest queued message to make room
+    #   "block"       - wait until a reader takes a message, so a fast
+    #                   producer runs at the pace of the reader
+    #   "spill"       - write it to an overflow file, spilled messages are
+    #                   read back in order as the queue drains. Without a
+    #                   spill_fname a temporary file is used.
+    # Every message that is dropped, spilled or has to wait is counted,
+    # see queue_stats().
+    #
+    QUEUE_POLICIES = ("drop","drop_oldest","block","spill")
+
+    def set_queue_policy(self, policy="drop", spill_fname=None):
+        if( policy not in self.QUEUE_POLICIES ):
+            raise ValueError("Unknown queue policy '%s', use one of: %s"%(
+                             policy,", ".join(self.QUEUE_POLICIES)))
+        self.mcond.acquire()
+        self.queue_policy = policy
+        if( policy=="spill" ):
+            self.spill_fname = spill_fname
+        self.mcond.release()
+        return
+
+    def get_queue_policy(self):
+        return self.queue_policy
+
+    ##
+    # Returns the counters of the message queue
+    #
+    def queue_stats(self):
+        return {'policy':self.queue_policy,
+                'queued':len(self.message_queue),
+                'spilled_now':self.spilled,
+                'dropped':self.dropped_messages,
+                'spilled':self.spilled_messages,
+                'blocked':self.blocked_puts}
+
+    ##
+    # Appends a message to the overflow file, the caller holds mcond
+    #
+    def _spill_message(self, m=None):
+        if( not self.spill_file ):
+            if( self.spill_fname ):
+                self.spill_file = open(self.spill_fname,"w+b")
+            else:
+                self.spill_file = tempfile.TemporaryFile()
+            self.spill_read = 0
+        self.spill_file.seek(0,2)
+        pickle.dump(m,self.spill_file,pickle.HIGHEST_PROTOCOL)
+        self.spilled += 1
+        self.spilled_messages += 1
+
+    ##
+    # Moves spilled messages back into the queue while there is room,
+    # the caller holds mcond. Once the file is read out it is emptied.
+    #
+    def _unspill_messages(self):
+        if( self.spilled<1 ):
+            return
+        self.spill_file.seek(self.spill_read)
+        while( self.spilled>0 and len(self.message_queue)<self.max_queue_len ):
+            self.message_queue.append(pickle.load(self.spill_file))
+            self.spilled -= 1
+        self.spill_read = self.spill_file.tell()
+        if( self.spilled<1 ):
+            self.spill_file.seek(0)
+            self.spill_file.truncate()
+            self.spill_read = 0
+
     ##
     # Web service objects have a message queue. This allows
     # responses to be put into a results queue for later access.
-    # A semaphore object is used to serialize access to the queue.
+    # The queue is a deque, so adding and taking a message is O(1),
+    # and a condition serializes access and wakes a waiting reader.
+    # What happens when the queue is full is set by set_queue_policy().
     #
     def put_message(self, m=None):
         if( self.my_receiver ):
             self.my_receiver.put_message(m)
-        else:
-            self.msem.acquire()
+            return
+        self.mcond.acquire()
+        try:
             #print "Base:put_message() queue_len::%d (%d)"%(len(self.message_queue),self.max_queue_len)
-            if( len(self.message_queue) < self.max_queue_len ):
+            policy = self.queue_policy
+            if( self.spilled>0 ):
+                # keep the order, nothing jumps ahead of the spilled messages
+                self._spill_message(m)
+            elif( len(self.message_queue) < self.max_queue_len ):
                 self.message_queue.append(m)
+            elif( policy=="spill" ):
+                self._spill_message(m)
+            elif( policy=="block" ):
+                self.blocked_puts += 1
+                self._wait_while(lambda: len(self.message_queue) >= self.max_queue_len)
+                self.message_queue.append(m)
+            elif( policy=="drop_oldest" ):
+                self.message_queue.popleft()
+                self.message_queue.append(m)
+                self.dropped_messages += 1
             else:
+                self.dropped_messages += 1
                 self.logger.info("Message queue length exceeded")
-            self.msem.release()
+            self.mcond.notify_all()
+        finally:
+            self.mcond.release()
 
     ##
     # Web service objects have a message queue. This allows other
-    # objects/threads to check the number of messages in the queue.
-    # A semaphore object is used to serialize access to the queue.
+    # objects/threads to check the number of messages in the queue,
+    # including any in the overflow file. Reading the counts does not
+    # take the lock.
     #
     def messages(self):
-        count = None
-        self.msem.acquire()
-        count = len(self.message_queue)
-        self.msem.release()
-        return count
+        return len(self.message_queue)+self.spilled
 
     ##
     # Web service objects have a message queue. This allows other
-    # objects/threads to get an item from the queue.
-    # A semaphore object is used to serialize access to the queue.
-    #
-    def get_message(self,flush=False):
+    # objects/threads to get an item from the queue. With block=True
+    # this waits for a message while a query is in process, for at most
+    # timeout seconds if one is given. It wakes as soon as a message is
+    # put, the request finishes or the thread stops. Returns None when
+    # there is no message (the queue is empty and the query is done, or
+    # timed out).
+    #
+    def get_message(self, flush=False, block=False, timeout=None):
         data = None
-        self.msem.acquire()
-        if( len(self.message_queue) > 0 ):
-            if( flush ):
-                self.message_queue = []
-            else:
-                data = self.message_queue[0]
-                self.message_queue = self.message_queue[1:]
-                #print "Base:get_message() queue_len::%d (%d)"%(len(self.message_queue),self.max_queue_len)
-        self.msem.release()
+        self.mcond.acquire()
+        try:
+            if( block ):
+                self._wait_while(lambda: (len(self.message_queue)<1) and self.query_in_process(),
+                                 timeout=timeout)
+            if( len(self.message_queue) > 0 ):
+                if( flush ):
+                    self.message_queue.clear()
+                    if( self.spilled>0 ):
+                        self.spilled = 0
+                        self.spill_file.seek(0)
+                        self.spill_file.truncate()
+                        self.spill_read = 0
+                else:
+                    data = self.message_queue.popleft()
+                    self._unspill_messages()
+                    #print "Base:get_message() queue_len::%d (%d)"%(len(self.message_queue),self.max_queue_len)
+                # wakes a producer blocked on a full queue
+                self.mcond.notify_all()
+        finally:
+            self.mcond.release()
         return data
 
     ##
@@ -461,6 +643,7 @@ class Base(Thread):
             self.async_timer.terminate_thread()
         self.running = False
         self.rsem.release()
+        self._notify_waiters()
 
     ##
     # Initialize an asynchronous timer that will be used to initiate
@@ -527,15 +710,16 @@ class Base(Thread):
                 result = self._auth_request(request=request)
             else:
                 self.push_request_info(request=request)
+                session = self.get_requests_session(url=request['domain'])
                 if( request['method']=="POST" ):
-                    result = self.requests_session.post(request['domain'],
-                                                        params=request['params'],
-                                                        headers=request['headers'],
-                                                        data=request['payload'])
+                    result = session.post(request['domain'],
+                                          params=request['params'],
+                                          headers=request['headers'],
+                                          data=request['payload'])
                 else:
-                    result = self.requests_session.get(request['domain'],
-                                                       params=request['params'],
-                                                       headers=request['headers'])
+                    result = session.get(request['domain'],
+                                         params=request['params'],
+                                         headers=request['headers'])
             #print "in Base.py _make_request()"
             #print result
             #print result.text
@@ -598,28 +782,44 @@ class Base(Thread):
             request_results = []
             #print "REQUEST:", self._request_data
             request_results = self._make_request(request=self._request_data)
-            if( request_results ):
-                try:
-                    js = request_results.json()
-                    self.put_message(m=js)
-                except ValueError, e:
-                    self.put_message(m=request_results)
+            self.handle_response(request=self._request_data, response=request_results)
             self.querying = False
         except:
             self.querying = False
             raise
         return request_results
+
+    ##
+    # Puts the result of a request on the message queue, the json if the
+    # response has some, otherwise the response itself. Called for the
+    # requests made by make_request() and by a RequestExecutor, so a
+    # subclass that overrides this handles its responses either way.
+    #
+    def handle_response(self, request=None, response=None):
+        if( response ):
+            try:
+                js = response.json()
+                self.put_message(m=js)
+            except ValueError, e:
+                self.put_message(m=response)
+        return
     
     
     ##
     # This idiom is used frequently for asynchronous requests
     # The thread calling this wait, should *NOT* be called by *THIS*
     # thread or the web request will end up in a deadlock!
+    # Returns as soon as there is a message, or the requests started so
+    # far are done, or the thread stops, or after timeout seconds.
     #
-    def wait_request(self):
-        time.sleep(2)
-        while( (self.messages()<1) and self.query_in_process() ):
-            time.sleep(2)
+    def wait_request(self, timeout=None):
+        self.mcond.acquire()
+        try:
+            done = self._wait_while(lambda: (self.messages()<1) and self.query_in_process(),
+                                    timeout=timeout)
+        finally:
+            self.mcond.release()
+        return done
 
     ##
     # This simply releases a semaphore lock to allow the waiting
@@ -627,19 +827,34 @@ class Base(Thread):
     # a thread - this is the way to have the thread issue requests.
     #
     def start_request(self):
+        self.mcond.acquire()
+        self.requests_started += 1
+        self.mcond.release()
         self.rsem.release()
         return
 
     ##
     # This run method simply waits for the blocking semaphore to be
-    # released - and then it issues the request.
+    # released - and then it issues the request. Waiting threads are
+    # woken when each request is done and when the thread stops.
     #
     def run(self):
         try:
             while( self.running ):
                 self.rsem.acquire()
-                self.make_request()
+                if( not self.running ):
+                    # released by terminate_thread(), not a request
+                    break
+                try:
+                    self.make_request()
+                finally:
+                    self.mcond.acquire()
+                    self.requests_done += 1
+                    self.mcond.notify_all()
+                    self.mcond.release()
         except:
             self.running = False
             raise
+        finally:
+            self._notify_waiters()
         return
@@ -10,8 +10,8 @@
 #
 import os, gc, sys, datetime, time, logging, warnings 
 import webbrowser
-import requests
 import requests_oauthlib
+from sochi.common.SessionPool import get_session, drop_sessions
 #from cStringIO import StringIO
 
 
@@ -28,7 +28,8 @@ class OAuthBase(object):
         self.name = name
         self.app_name = app_name
         self.app_user = app_user
-        self.requests_session = None
+        self.requests_session = None # own session, None uses the shared ones
+        self.session_credentials = None # credentials the shared sessions were made with
         if( token_fname ):
             self.token_fname = token_fname
         else:
@@ -50,23 +51,54 @@ class OAuthBase(object):
         self.last_header = None
         self.debug = False
 
+    ##
+    # The key of the shared sessions signed with these credentials
+    #
+    def credentials(self):
+        return (self.consumer_key, self.consumer_secret,
+                self.oauth_token, self.oauth_secret)
+
+    def _new_session(self):
+        return requests_oauthlib.OAuth1Session(client_key=self.consumer_key,
+                                               client_secret=self.consumer_secret,
+                                               resource_owner_key=self.oauth_token,
+                                               resource_owner_secret=self.oauth_secret)
+
+    ##
+    # Returns the OAuth session for a request to url. Unless this login
+    # was given a session of its own, that is this thread's session over
+    # the connections shared in the process by every login with the same
+    # credentials, per host (see SessionPool).
+    #
+    def get_requests_session(self, url=None):
+        if( self.requests_session ):
+            return self.requests_session
+        self.drop_stale_sessions()
+        self.session_credentials = self.credentials()
+        return get_session(url=url, credentials=self.session_credentials,
+                           factory=self._new_session)
+
+    ##
+    # Drops the shared sessions made with the credentials this login had
+    # before, when its keys or tokens have changed since
+    #
+    def drop_stale_sessions(self):
+        if( self.session_credentials and self.session_credentials!=self.credentials() ):
+            drop_sessions(credentials=self.session_credentials)
+            self.session_credentials = None
+        return
+
+    ##
+    # Drops the sessions of these credentials, the next request makes
+    # new ones, with new connections
+    #
     def reset_requests_session(self):
         if( self.requests_session ):
             self.requests_session.close()
             self.requests_session = None
             gc.collect()
-        self.requests_session = requests_oauthlib.OAuth1Session(client_key=self.consumer_key,
-                                                      client_secret=self.consumer_secret,
-                                                      resource_owner_key=self.oauth_token,
-                                                      resource_owner_secret=self.oauth_secret)
-        r_a1 = requests.adapters.HTTPAdapter(pool_connections=100,
-                                             pool_maxsize=100,
-                                             max_retries=3)
-        r_a2 = requests.adapters.HTTPAdapter(pool_connections=100, 
-                                             pool_maxsize=100,
-                                             max_retries=3)
-        self.requests_session.mount('http://', r_a1)
-        self.requests_session.mount('https://', r_a2)
+        else:
+            drop_sessions(credentials=self.credentials())
         return
 
 
@@ -240,19 +272,18 @@ class OAuthBase(object):
 
     def make_request(self, request=None):
         result = []
-        if( not self.requests_session ):
-            raise requests.exceptions.ConnectionError("Need OAuthSession - reset_requests_session()")
+        session = self.get_requests_session(url=request['domain'])
         if( request['method']=="POST" ):
             #print "OAUTH POST request:",request
-            result = self.requests_session.post(request['domain'],
-                                                params=request['params'],
-                                                headers=request['headers'],
-                                                data=request['payload'])
+            result = session.post(request['domain'],
+                                  params=request['params'],
+                                  headers=request['headers'],
+                                  data=request['payload'])
         else:
             #print "OAUTH GET request:",request
-            result = self.requests_session.get(request['domain'],
-                                               params=request['params'],
-                                               headers=request['headers'])
+            result = session.get(request['domain'],
+                                 params=request['params'],
+                                 headers=request['headers'])
         return result
 
 
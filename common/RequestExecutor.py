@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: RequestExecutor.py
+#
+#   A fixed pool of worker threads that makes requests for any number of
+#   web service objects based on Base. An object builds a request with
+#   set_request() as usual and submits the request descriptor, instead of
+#   running a thread of its own. A worker makes the request with the
+#   object's _make_request(), so its authentication, throttling and error
+#   handling still apply, and hands the response to the object's
+#   handle_response(), which puts the result on that object's message
+#   queue. Tracking more terms adds objects, not threads.
+#
+#   The requests of one object run one at a time, in the order they were
+#   submitted, since an object keeps the state of its last request (its
+#   request info, rate limits and continuations). While one of them is
+#   queued or running the rest wait behind it, and the worker that ran it
+#   goes on with the next. max_pending limits the requests waiting for a
+#   worker, not the ones waiting behind a request of the same object.
+#
+#   While an object has requests waiting or running query_in_process()
+#   is True, so the usual consumer loop works unchanged
+#
+#       while( twit.messages()>0 or twit.query_in_process() ):
+#           m = twit.get_message(block=True)
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import logging
+import Queue, collections
+from threading import Thread, Lock
+
+
+class RequestExecutor(object):
+    def __init__(self, workers=8, name="RequestExecutor", max_pending=0, logger=None):
+        if( logger ):
+            self.logger = logger
+        else:
+            self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.jobs = Queue.Queue(maxsize=max_pending) # submit() waits when this is full
+        self.lock = Lock()
+        self.in_flight = {}       # id(caller) -> requests waiting or running
+        self.waiting = {}         # id(caller) -> requests behind the running one
+        self.completed = 0
+        self.failed = 0
+        self.running = True
+        self.workers = []
+        for i in range(workers):
+            t = Thread(target=self._work, name="%s-%d"%(name,i))
+            t.daemon = True
+            t.start()
+            self.workers.append(t)
+
+    ##
+    # Queues a request for the caller object, the request descriptor built
+    # by its set_request() when none is given
+    #
+    def submit(self, caller=None, request=None):
+        assert caller is not None
+        if( not self.running ):
+            raise RuntimeError("%s is shut down"%(self.name))
+        if( request is None ):
+            request = caller.get_request_data()
+        queued = False
+        self.lock.acquire()
+        key = id(caller)
+        self.in_flight[key] = self.in_flight.get(key,0)+1
+        if( self.in_flight[key]==1 ):
+            caller.querying = True
+            self.waiting[key] = collections.deque()
+        else:
+            self.waiting[key].append(request)
+            queued = True
+        self.lock.release()
+        if( not queued ):
+            self.jobs.put((caller,request))
+        return
+
+    ##
+    # Counts a finished request of the caller and returns the next one
+    # waiting behind it, or None when the caller has no more
+    #
+    def _done(self, caller=None, ok=True):
+        request = None
+        self.lock.acquire()
+        if( ok ):
+            self.completed += 1
+        else:
+            self.failed += 1
+        key = id(caller)
+        self.in_flight[key] -= 1
+        if( self.in_flight[key]<1 ):
+            del self.in_flight[key]
+            del self.waiting[key]
+            caller.querying = False
+        else:
+            request = self.waiting[key].popleft()
+        self.lock.release()
+        return request
+
+    def _run(self, caller=None, request=None):
+        try:
+            response = caller._make_request(request=request)
+            caller.handle_response(request=request, response=response)
+        except Exception, e:
+            mesg = "%s request failed: %s"%(caller.name,str(e))
+            self.logger.info(mesg)
+            return False
+        return True
+
+    def _work(self):
+        while( True ):
+            job = self.jobs.get()
+            if( job is None ):
+                self.jobs.task_done()
+                break
+            caller, request = job
+            try:
+                while( request is not None ):
+                    request = self._done(caller,self._run(caller,request))
+            finally:
+                self.jobs.task_done()
+        return
+
+    ##
+    # Number of requests submitted but not finished yet
+    #
+    def pending(self):
+        self.lock.acquire()
+        count = sum(self.in_flight.values())
+        self.lock.release()
+        return count
+
+    ##
+    # Waits until every submitted request is done
+    #
+    def join(self):
+        self.jobs.join()
+
+    ##
+    # Stops the workers once the requests already queued are done
+    #
+    def shutdown(self, wait=True):
+        self.running = False
+        for t in self.workers:
+            self.jobs.put(None)
+        if( wait ):
+            for t in self.workers:
+                t.join()
+        return
+
+
+if __name__ == '__main__':
+    print "No main()"
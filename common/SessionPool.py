@@ -0,0 +1,176 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: SessionPool.py
+#
+#   The http connection pools shared by every web service object in a
+#   process. There is one set of adapters, with their connection pools,
+#   per set of auth credentials and host, so all of the Search,
+#   UserLookup, ... objects that use the same login talk to
+#   api.twitter.com over the same kept alive TLS connections instead of
+#   each object opening its own.
+#
+#   A requests.Session, with its cookie jar and auth state, is not safe
+#   to use from several threads at once, so each thread gets a session
+#   of its own for a key. Those sessions are cheap, they hold no
+#   connections; the adapters mounted on them are shared, and the
+#   connection pool of an adapter is safe to use from several threads.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import urlparse, itertools
+from threading import Lock, local
+import requests
+
+POOL_CONNECTIONS = 100
+POOL_MAXSIZE = 100    # connections kept per host, per key
+MAX_RETRIES = 3
+PREFIXES = ['http://','https://']
+
+_lock = Lock()
+_adapters = {}        # (credentials, (scheme, host)) -> (generation, {prefix: adapter})
+_generations = itertools.count(1)
+_local = local()      # sessions of this thread, key -> (generation, session)
+
+
+def _host(url=None):
+    if( not url ):
+        return None
+    parts = urlparse.urlsplit(url)
+    return (parts.scheme.lower(), parts.netloc.lower())
+
+
+def _new_adapters():
+    adapters = {}
+    for prefix in PREFIXES:
+        adapters[prefix] = requests.adapters.HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                                         pool_maxsize=POOL_MAXSIZE,
+                                                         max_retries=MAX_RETRIES)
+    return adapters
+
+
+##
+# The key of the sessions for the host of url and the credentials
+#
+def session_key(url=None, credentials=None):
+    return (credentials, _host(url))
+
+
+##
+# Returns this thread's session for the host of url and the credentials,
+# a hashable tuple or None for requests without auth. The session is
+# made by factory(), a plain requests.Session when there is no factory,
+# the first time the thread asks for the key, and again after the key
+# is dropped or its adapters are replaced. Every thread's session for a
+# key has the same adapters mounted, so they share the connections.
+#
+def get_session(url=None, credentials=None, factory=None):
+    key = session_key(url=url, credentials=credentials)
+    _lock.acquire()
+    try:
+        entry = _adapters.get(key)
+        if( entry is None ):
+            entry = (_generations.next(), _new_adapters())
+            _adapters[key] = entry
+    finally:
+        _lock.release()
+    sessions = getattr(_local,'sessions',None)
+    if( sessions is None ):
+        sessions = {}
+        _local.sessions = sessions
+    generation, adapters = entry
+    cached = sessions.get(key)
+    if( cached and cached[0]==generation ):
+        return cached[1]
+    if( factory ):
+        session = factory()
+    else:
+        session = requests.Session()
+    for prefix in PREFIXES:
+        session.mount(prefix, adapters[prefix])
+    # a session replaced here is not closed, closing it would close the
+    # adapters other threads may still be using
+    sessions[key] = (generation, session)
+    return session
+
+
+##
+# Forgets the shared adapters of the credentials, for one host or for
+# all hosts when there is no url, so the next request of every thread
+# makes a new session, with new connections. The forgotten adapters are
+# not closed, other threads may still be using them, they are closed
+# when they are collected. Returns how many keys were dropped.
+#
+def drop_sessions(credentials=None, url=None):
+    host = _host(url)
+    _lock.acquire()
+    try:
+        keys = [k for k in _adapters if k[0]==credentials and (host is None or k[1]==host)]
+        for key in keys:
+            del _adapters[key]
+    finally:
+        _lock.release()
+    return len(keys)
+
+
+##
+# Puts adapter in place of the shared adapters for the host of url and
+# the credentials, every thread's session for that key picks it up with
+# its next request. Returns the adapters it replaced, for
+# restore_adapters(), None when the key had none yet.
+#
+def mount_adapter(url=None, credentials=None, adapter=None):
+    key = session_key(url=url, credentials=credentials)
+    _lock.acquire()
+    try:
+        entry = _adapters.get(key)
+        _adapters[key] = (_generations.next(), dict([(p,adapter) for p in PREFIXES]))
+    finally:
+        _lock.release()
+    if( entry ):
+        return entry[1]
+    return None
+
+
+##
+# Puts back the adapters mount_adapter() replaced, unless the key no
+# longer uses the mounted adapter, it was dropped or mounted over since
+#
+def restore_adapters(url=None, credentials=None, adapters=None, mounted=None):
+    key = session_key(url=url, credentials=credentials)
+    _lock.acquire()
+    try:
+        entry = _adapters.get(key)
+        if( entry and entry[1]['https://'] is mounted ):
+            if( adapters ):
+                _adapters[key] = (_generations.next(), adapters)
+            else:
+                del _adapters[key]
+    finally:
+        _lock.release()
+    return
+
+
+##
+# Closes and forgets every shared adapter
+#
+def close_sessions():
+    _lock.acquire()
+    try:
+        entries = _adapters.values()
+        _adapters.clear()
+    finally:
+        _lock.release()
+    for generation, adapters in entries:
+        for adapter in set(adapters.values()):
+            adapter.close()
+    return
+
+
+def session_count():
+    return len(_adapters)
+
+
+if __name__ == '__main__':
+    print "No main()"
@@ -16,8 +16,14 @@ from sochi.data.db.base.userObj import userObj
 from sochi.data.db.base.userMetaObj import userMetaObj
 from sochi.data.db.base.friendObj import friendObj
 from sochi.data.db.base.followerObj import followerObj
+from sochi.data.db.base.tweetHashtagObj import tweetHashtagObj
+from sochi.data.db.base.tweetMentionObj import tweetMentionObj
+from sochi.data.db.base.tweetUrlObj import tweetUrlObj
+from sqlalchemy import func, select
 from sqlalchemy.orm import mapper, class_mapper
 from sqlalchemy.orm.exc import UnmappedClassError
+from datetime import datetime
+from collections import namedtuple
 import sys
 
 
@@ -26,6 +32,51 @@ USER_TABLE_NAME = "twitter_users"
 USER_META_TABLE_NAME = "twitter_user_meta"
 FRIENDS_TABLE_NAME = "twitter_friends"
 FOLLOWERS_TABLE_NAME = "twitter_followers"
+TWEET_HASHTAGS_TABLE_NAME = "twitter_tweet_hashtags"
+TWEET_MENTIONS_TABLE_NAME = "twitter_tweet_mentions"
+TWEET_URLS_TABLE_NAME = "twitter_tweet_urls"
+
+# ids per IN (...) query, well under the parameter limits of SQLite and MySQL
+IN_QUERY_SIZE = 500
+
+# rows fetched at a time by the streaming queries
+STREAM_CHUNK_SIZE = 1000
+
+# the tweet columns the analyses read, the default of the column queries
+TWEET_READ_COLUMNS = ('tweet_id','created_at','from_user','tweet_text')
+
+_row_types = {}
+
+
+##
+# The named tuple type of the rows of a column query, one per set of
+# columns
+#
+def tweet_row_type(columns=TWEET_READ_COLUMNS):
+    columns = tuple(columns)
+    row_type = _row_types.get(columns)
+    if( row_type is None ):
+        row_type = namedtuple("TweetRow", columns)
+        # the type is made at run time, so a pickled row names the columns
+        # and is made again through tweet_row()
+        row_type.__reduce__ = lambda row: (tweet_row, (row._fields, tuple(row)))
+        _row_types[columns] = row_type
+    return row_type
+
+
+def tweet_row(columns=None, values=None):
+    return tweet_row_type(columns)._make(values)
+
+
+##
+# Parses the created_at of a Twitter API tweet, like
+# "Wed Feb 12 18:07:51 +0000 2014", the offset is always +0000
+#
+def parse_status_date(dstr=None):
+    ts = dstr.rpartition(' ')[0]
+    yr = dstr.rpartition(' ')[2]
+    ts = ts.rpartition(' ')[0]
+    return datetime.strptime(ts+" "+yr,"%a %b %d %H:%M:%S %Y")
 
 
 class TweetsDB(BaseDB):
@@ -38,6 +89,11 @@ class TweetsDB(BaseDB):
         self.user_meta_table = self.db.get_table(USER_META_TABLE_NAME)
         self.friends_table = self.db.get_table(FRIENDS_TABLE_NAME)
         self.followers_table = self.db.get_table(FOLLOWERS_TABLE_NAME)
+        # the entity tables are newer than most collections, they are
+        # only mapped when the database has them
+        self.hashtags_table = self._optional_table(TWEET_HASHTAGS_TABLE_NAME)
+        self.mentions_table = self._optional_table(TWEET_MENTIONS_TABLE_NAME)
+        self.urls_table = self._optional_table(TWEET_URLS_TABLE_NAME)
 
         try:
             self.tweet_mapper = class_mapper(TweetObj)
@@ -64,6 +120,38 @@ class TweetsDB(BaseDB):
         except UnmappedClassError:
             self.follower_mapper = mapper(followerObj,self.followers_table)
 
+        self.hashtag_mapper = None
+        self.mention_mapper = None
+        self.url_mapper = None
+        if( self.has_entity_tables() ):
+            try:
+                self.hashtag_mapper = class_mapper(tweetHashtagObj)
+            except UnmappedClassError:
+                self.hashtag_mapper = mapper(tweetHashtagObj,self.hashtags_table)
+
+            try:
+                self.mention_mapper = class_mapper(tweetMentionObj)
+            except UnmappedClassError:
+                self.mention_mapper = mapper(tweetMentionObj,self.mentions_table)
+
+            try:
+                self.url_mapper = class_mapper(tweetUrlObj)
+            except UnmappedClassError:
+                self.url_mapper = mapper(tweetUrlObj,self.urls_table)
+
+    def _optional_table(self, table_name=None):
+        if( self.db.engine.has_table(table_name) ):
+            return self.db.get_table(table_name)
+        return None
+
+    ##
+    # True when the database has the hashtag, mention and url tables
+    #
+    def has_entity_tables(self):
+        return ((self.hashtags_table is not None) and
+                (self.mentions_table is not None) and
+                (self.urls_table is not None))
+
 ##
 # New object creation routines
 ##
@@ -128,6 +216,141 @@ class TweetsDB(BaseDB):
             rec = nf.to_dict()
         return rec
 
+    ##
+    # Adds the hashtag, mention and url rows of one tweet from the
+    # 'entities' dictionary of a Twitter API tweet. The rows are added to
+    # the session like any other item, commit_changes() writes them.
+    # Returns the number of rows added.
+    #
+    def insert_tweet_entities(self, tweet_id=None, created_at=None, entities=None):
+        count = 0
+        if( not entities or not self.has_entity_tables() ):
+            return count
+        hashtags, mentions, urls = self._entity_rows(tweet_id=tweet_id, created_at=created_at,
+                                                     entities=entities)
+        for obj, rows in [(tweetHashtagObj,hashtags), (tweetMentionObj,mentions), (tweetUrlObj,urls)]:
+            for row in rows:
+                self.insert_item(obj().from_dict(row))
+                count += 1
+        return count
+
+    ##
+    # The hashtag, mention and url rows of one tweet from an API
+    # 'entities' dictionary, as lists of column dictionaries
+    #
+    def _entity_rows(self, tweet_id=None, created_at=None, entities=None, text_filter=None):
+        hashtags = []
+        for ht in (entities.get('hashtags') or []):
+            text = ht['text']
+            if( text_filter ):
+                text = text_filter(text)
+            hashtags.append({'tweet_id':tweet_id, 'created_at':created_at, 'hashtag':text})
+        mentions = []
+        for um in (entities.get('user_mentions') or []):
+            mentions.append({'tweet_id':tweet_id, 'created_at':created_at,
+                             'user_id':long(um['id_str']), 'screen_name':um['screen_name']})
+        urls = []
+        for url in (entities.get('urls') or []):
+            urls.append({'tweet_id':tweet_id, 'created_at':created_at,
+                         'url':url['url'], 'expanded_url':url.get('expanded_url')})
+        return hashtags, mentions, urls
+
+    ##
+    # The ids in ids that are already in column, with one IN query per
+    # IN_QUERY_SIZE ids
+    #
+    def _existing_ids(self, column=None, ids=None):
+        found = set()
+        ids = list(ids)
+        for i in xrange(0,len(ids),IN_QUERY_SIZE):
+            q = select([column]).where(column.in_(ids[i:i+IN_QUERY_SIZE]))
+            found.update([row[0] for row in self.session.execute(q)])
+        return found
+
+    ##
+    # The tweet table row of one API tweet, the same values that
+    # collect_tweets.save_tweet() sets on a tweet object. text_filter,
+    # when given, cleans the tweet text (and the hashtags), for example
+    # of characters the database can't store.
+    #
+    def _tweet_row(self, status=None, source="", text_filter=None):
+        text = status['text']
+        if( text_filter ):
+            text = text_filter(text)
+        row = {'tweet_id':status['id'],
+               'tweet_id_str':status['id_str'],
+               'created_at':parse_status_date(status['created_at']),
+               'from_user_name':status['user']['name'],
+               'from_user':status['user']['screen_name'],
+               'from_user_id':long(status['user']['id_str']),
+               'tweet_text':text,
+               'query_source':source,
+               'lat':None,
+               'lon':None}
+        geo = status.get('geo')
+        if( geo and ((geo['type']=="Point") or (geo['type']=="point")) ):
+            row['lat'] = geo['coordinates'][0]
+            row['lon'] = geo['coordinates'][1]
+        return row
+
+    ##
+    # Bulk ingest of one page of Twitter API tweets. The tweets and
+    # users already in the database are found with one IN query each for
+    # the whole page (instead of a query per tweet and per user), and the
+    # new tweets, users and entity rows are written with one executemany
+    # INSERT per table. Tweets repeated within the page are only added
+    # once. Like insert_item() this runs in the session's transaction.
+    # Returns counts of what was added and skipped.
+    #
+    def insert_tweet_page(self, statuses=None, source="", text_filter=None):
+        result = {'tweets':0, 'known_tweets':0, 'users':0, 'entities':0}
+        statuses = [s for s in (statuses or []) if (type(s) is dict) and ('id' in s)]
+        if( not statuses ):
+            return result
+        # make the items added with insert_item() visible to the queries
+        self.session.flush()
+        columns = set(self.tweet_table.c.keys())
+        known = self._existing_ids(self.tweet_table.c.tweet_id,
+                                   set([s['id'] for s in statuses]))
+        tweet_rows = []
+        entity_rows = ([],[],[])
+        users = {}
+        for status in statuses:
+            # users are keyed by screen name, like save_user() checks them
+            users.setdefault(status['user']['screen_name'], status['user'])
+            if( status['id'] in known ):
+                continue
+            known.add(status['id'])
+            row = self._tweet_row(status=status, source=source, text_filter=text_filter)
+            tweet_rows.append(dict([(k,v) for k,v in row.items() if k in columns]))
+            if( status.get('entities') and self.has_entity_tables() ):
+                rows = self._entity_rows(tweet_id=row['tweet_id'], created_at=row['created_at'],
+                                         entities=status['entities'], text_filter=text_filter)
+                for rlist, more in zip(entity_rows,rows):
+                    rlist.extend(more)
+        if( tweet_rows ):
+            self.session.execute(self.tweet_table.insert(), tweet_rows)
+            result['tweets'] = len(tweet_rows)
+        if( self.has_entity_tables() ):
+            for table, rows in zip([self.hashtags_table,self.mentions_table,self.urls_table],
+                                   entity_rows):
+                if( rows ):
+                    self.session.execute(table.insert(), rows)
+                    result['entities'] += len(rows)
+
+        known_users = self._existing_ids(self.user_table.c.user_name, users.keys())
+        user_rows = []
+        for uname, user in users.items():
+            if( uname not in known_users ):
+                user_rows.append({'user_name':uname,
+                                  'screen_name':user['name'],
+                                  'user_id':long(user['id_str'])})
+        if( user_rows ):
+            self.session.execute(self.user_table.insert(), user_rows)
+            result['users'] = len(user_rows)
+        result['known_tweets'] = len(statuses)-len(tweet_rows)
+        return result
+
 ##
 # straight forward query types
 ##
@@ -164,6 +387,91 @@ class TweetsDB(BaseDB):
         tlist = q.all()
         return tlist
 
+    ##
+    # Like query_tweet_table_by_date_range(), but yields the tweets as
+    # they are read instead of returning a list. The rows come from a
+    # server side cursor (MySQLdb's SSCursor) chunk_size at a time, so
+    # only about a chunk of tweet objects is in memory at once, however
+    # long the date range. The cursor holds the connection until the
+    # iteration ends, don't run other queries on this database object
+    # from inside the loop.
+    #
+    def iter_tweet_table_by_date_range(self, start_date=None, end_date=None, in_order=True,
+                                       chunk_size=STREAM_CHUNK_SIZE):
+        q = self._tweet_table_date_range(start_date=start_date, end_date=end_date)
+        if( in_order ):
+            q = q.order_by(self.tweet_table.c.created_at)
+        for tweet in q.yield_per(chunk_size):
+            yield tweet
+
+    ##
+    # A keyed paged query (see BaseDB.new_paged_query()) of the tweets in
+    # a date range, in (created_at, rid) order. Read the pages with
+    # paged_query_fetch_page() until it returns an empty list.
+    #
+    def new_tweet_table_paged_query(self, start_date=None, end_date=None, page_size=None):
+        q = self._tweet_table_date_range(start_date=start_date, end_date=end_date)
+        qid = self.new_paged_query(q, keys=[self.tweet_table.c.created_at,
+                                            self.tweet_table.c.rid])
+        if( page_size ):
+            self.paged_query_page_size(qid, page_size)
+        return qid
+
+    ##
+    # Read only queries of a few columns of the tweets in a date range.
+    # They skip the ORM, no tweet objects are built or tracked by the
+    # session, and return each row as a named tuple, so tweet.tweet_text
+    # still works. A row of just ('tweet_id','tweet_text') can go to the
+    # batch functions that take (id, text) tuples. With as_columns the
+    # result is a dictionary of column name to the list of its values.
+    #
+    def query_tweet_columns_by_date_range(self, columns=TWEET_READ_COLUMNS, start_date=None,
+                                          end_date=None, in_order=True, as_columns=False):
+        q = self._tweet_columns_date_range(columns=columns, start_date=start_date,
+                                           end_date=end_date, in_order=in_order)
+        rows = self.session.execute(q).fetchall()
+        if( as_columns ):
+            values = zip(*rows) or [[] for column in columns]
+            return dict(zip(columns,[list(v) for v in values]))
+        row_type = tweet_row_type(columns)
+        return [row_type._make(row) for row in rows]
+
+    ##
+    # The streaming version of query_tweet_columns_by_date_range(), the
+    # rows are read from a server side cursor chunk_size at a time
+    #
+    def iter_tweet_columns_by_date_range(self, columns=TWEET_READ_COLUMNS, start_date=None,
+                                         end_date=None, in_order=True,
+                                         chunk_size=STREAM_CHUNK_SIZE):
+        q = self._tweet_columns_date_range(columns=columns, start_date=start_date,
+                                           end_date=end_date, in_order=in_order)
+        result = self.session.execute(q.execution_options(stream_results=True))
+        row_type = tweet_row_type(columns)
+        try:
+            rows = result.fetchmany(chunk_size)
+            while( rows ):
+                for row in rows:
+                    yield row_type._make(row)
+                rows = result.fetchmany(chunk_size)
+        finally:
+            result.close()
+
+    def _tweet_columns_date_range(self, columns=None, start_date=None, end_date=None,
+                                  in_order=True):
+        created_at = self.tweet_table.c.created_at
+        q = select([self.tweet_table.c[name] for name in columns])
+        if( start_date ):
+            q = q.where(created_at>=start_date)
+        if( end_date ):
+            q = q.where(created_at<end_date)
+        if( in_order ):
+            q = q.order_by(created_at)
+        return q
+
+    def count_tweet_table_by_date_range(self, start_date=None, end_date=None):
+        q = self._tweet_table_date_range(start_date=start_date, end_date=end_date)
+        return q.count()
+
     def _tweet_table_date_range(self, start_date=None, end_date=None):
         query = self.session.query(TweetObj)
         if( start_date and end_date ):
@@ -176,6 +484,49 @@ class TweetsDB(BaseDB):
             pass
         return query
 
+    ##
+    ## Query the entity tables
+    ##
+    def query_hashtags_by_tweet_id(self, tid):
+        return self.session.query(tweetHashtagObj).filter(tweetHashtagObj.tweet_id==tid).all()
+
+    def query_mentions_by_tweet_id(self, tid):
+        return self.session.query(tweetMentionObj).filter(tweetMentionObj.tweet_id==tid).all()
+
+    def query_urls_by_tweet_id(self, tid):
+        return self.session.query(tweetUrlObj).filter(tweetUrlObj.tweet_id==tid).all()
+
+    ##
+    # Counts the uses of each hashtag in a date range, returns a list of
+    # (hashtag, count) with the most used first
+    #
+    def count_hashtags_by_date_range(self, start_date=None, end_date=None, limit=None):
+        return self._count_entity_by_date_range(tweetHashtagObj, tweetHashtagObj.hashtag,
+                                                start_date=start_date, end_date=end_date,
+                                                limit=limit)
+
+    ##
+    # Counts the mentions of each screen name in a date range, returns a
+    # list of (screen_name, count) with the most mentioned first
+    #
+    def count_mentions_by_date_range(self, start_date=None, end_date=None, limit=None):
+        return self._count_entity_by_date_range(tweetMentionObj, tweetMentionObj.screen_name,
+                                                start_date=start_date, end_date=end_date,
+                                                limit=limit)
+
+    def _count_entity_by_date_range(self, obj=None, column=None, start_date=None, end_date=None,
+                                    limit=None):
+        count = func.count(obj.rid)
+        q = self.session.query(column, count)
+        if( start_date ):
+            q = q.filter(obj.created_at>=start_date)
+        if( end_date ):
+            q = q.filter(obj.created_at<end_date)
+        q = q.group_by(column).order_by(count.desc())
+        if( limit ):
+            q = q.limit(limit)
+        return q.all()
+
     ##
     ## Query the user table
     ##
@@ -10,6 +10,7 @@
 #
 #
 import os
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import clear_mappers
 
 class BaseDB(object):
@@ -37,10 +38,26 @@ class BaseDB(object):
             sys.exit(0)
         return True
 
-    def new_paged_query(self, query):
+    ##
+    # Registers a query to be read a page at a time. By default the pages
+    # are read with LIMIT and OFFSET, so the database reads and throws
+    # away all of the rows before each page. With keys, a list of the
+    # mapped columns that order the rows and are unique together (and
+    # not NULL), like (created_at, rid) or (tweet_id,), the pages are read
+    # by key instead.
+    # The query is ordered by the keys and each page starts after the
+    # last key of the page before, found through the index, so the last
+    # page costs the same as the first. Keyed pages are read with
+    # paged_query_fetch_page().
+    #
+    def new_paged_query(self, query, keys=None):
         qid = self.paged_qid
         self.paged_qid += 1
         q_rec = {'active_query':query,'limit_size':self.limit_size,'offset':self.offset}
+        if( keys ):
+            q_rec['keys'] = list(keys)
+            q_rec['last_key'] = None
+            q_rec['active_query'] = query.order_by(None).order_by(*keys)
         self.paged_queries[qid] = q_rec
         return qid
 
@@ -50,9 +67,15 @@ class BaseDB(object):
             return q_rec['active_query']
         return None
 
+    ##
+    # Replaces the query of a paged query. A keyed paged query orders the
+    # new query by its keys, the pages go on after the last key read.
+    #
     def update_paged_query(self, qid, q):
         if( self.paged_queries.has_key(qid) ):
             q_rec = self.paged_queries[qid]
+            if( q_rec.has_key('keys') ):
+                q = q.order_by(None).order_by(*q_rec['keys'])
             q_rec['active_query'] = q
             return True
         return False
@@ -77,9 +100,32 @@ class BaseDB(object):
             return True
         return False
 
+    ##
+    # Starts a keyed paged query after the row with these key values,
+    # in the order of the keys, like the offset for the other queries
+    #
+    def paged_query_starting_key(self, qid, s_key):
+        if( self.paged_queries.has_key(qid) and self.paged_queries[qid].has_key('keys') ):
+            q_rec = self.paged_queries[qid]
+            q_rec['last_key'] = tuple(s_key)
+            return True
+        return False
+
+    ##
+    # Returns the query for the next page. The page after a keyed page
+    # starts after the page's last key, so for keyed paged queries this
+    # reads the keys of the page (only the key columns) to know where
+    # the next one starts. paged_query_fetch_page() gets it from the rows.
+    #
     def paged_query_next_page(self, qid):
         if( self.paged_queries.has_key(qid) ):
             q_rec = self.paged_queries[qid]
+            if( q_rec.has_key('keys') ):
+                query = self._keyed_page_query(q_rec)
+                page_keys = query.with_entities(*q_rec['keys']).all()
+                if( page_keys ):
+                    q_rec['last_key'] = tuple(page_keys[-1])
+                return query
             query = q_rec['active_query']
             l = q_rec['limit_size']
             o = q_rec['offset']
@@ -87,6 +133,44 @@ class BaseDB(object):
             return query.limit(l).offset(o)
         return None
 
+    ##
+    # Reads the next page of a paged query and returns the list of rows,
+    # an empty list after the last page. A keyed paged query remembers
+    # the key of the last row for the next page.
+    #
+    def paged_query_fetch_page(self, qid):
+        if( not self.paged_queries.has_key(qid) ):
+            return None
+        q_rec = self.paged_queries[qid]
+        if( not q_rec.has_key('keys') ):
+            return self.paged_query_next_page(qid).all()
+        page = self._keyed_page_query(q_rec).all()
+        if( page ):
+            last = page[-1]
+            q_rec['last_key'] = tuple([getattr(last,key.key) for key in q_rec['keys']])
+        return page
+
+    ##
+    # The query of the page after the last key read of a keyed query
+    #
+    def _keyed_page_query(self, q_rec):
+        query = q_rec['active_query']
+        if( q_rec['last_key'] is not None ):
+            query = query.filter(self._after_key(q_rec['keys'], q_rec['last_key']))
+        return query.limit(q_rec['limit_size'])
+
+    ##
+    # The condition for the rows after the key values in the order of the
+    # keys, (a > x) OR (a = x AND b > y) ..., which MySQL can run as an
+    # index range where it can't for the row comparison (a, b) > (x, y)
+    #
+    def _after_key(self, keys, values):
+        terms = []
+        for i in range(len(keys)):
+            equal = [keys[j]==values[j] for j in range(i)]
+            terms.append(and_(*(equal+[keys[i]>values[i]])))
+        return or_(*terms)
+
     def delete_item(self, item):
         if( self.session ):
             self.session.delete(item)
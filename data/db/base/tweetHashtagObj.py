@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# 
+#   FILE: tweetHashtagObj.py
+#
+#   An object that mirrors the tweet_hashtags table in the database.
+#   One hashtag of a tweet, as given by the Twitter API entities.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+#
+from datetime import datetime
+import copy
+
+class tweetHashtagObj(object):
+    def __init__(self):
+        self.rid = None
+        self.tweet_id = 0
+        self.created_at = datetime(2000,1,1,0,0,0,0)
+        self.hashtag = u""
+
+
+    def to_dict(self):
+        rec = {}
+        if( self.rid > 0 ):
+            rec['rid'] = self.rid
+        rec['tweet_id'] = self.tweet_id
+        rec['created_at'] = self.created_at
+        rec['hashtag'] = self.hashtag
+        return rec
+
+    def from_dict(self, rec):
+        nobj = tweetHashtagObj()
+        if( rec ):
+            nobj.tweet_id = rec['tweet_id']
+            nobj.created_at = rec['created_at']
+            nobj.hashtag = rec['hashtag']
+        return nobj
+
+    def clone(self):
+        nobj = tweetHashtagObj()
+        if( self.rid > 0 ):
+            nobj.rid = self.rid
+        nobj.tweet_id = self.tweet_id
+        nobj.created_at = self.created_at
+        nobj.hashtag = self.hashtag
+        return nobj
+
+    def __repr__(self):
+        return "<tweetHashtagObj('%s','%s','%s',%r)>"%(str(self.rid),str(self.tweet_id),str(self.created_at),self.hashtag)
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# 
+#   FILE: tweetMentionObj.py
+#
+#   An object that mirrors the tweet_mentions table in the database.
+#   One user mention of a tweet, as given by the Twitter API entities.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+#
+from datetime import datetime
+import copy
+
+class tweetMentionObj(object):
+    def __init__(self):
+        self.rid = None
+        self.tweet_id = 0
+        self.created_at = datetime(2000,1,1,0,0,0,0)
+        self.user_id = 0
+        self.screen_name = u""
+
+
+    def to_dict(self):
+        rec = {}
+        if( self.rid > 0 ):
+            rec['rid'] = self.rid
+        rec['tweet_id'] = self.tweet_id
+        rec['created_at'] = self.created_at
+        rec['user_id'] = self.user_id
+        rec['screen_name'] = self.screen_name
+        return rec
+
+    def from_dict(self, rec):
+        nobj = tweetMentionObj()
+        if( rec ):
+            nobj.tweet_id = rec['tweet_id']
+            nobj.created_at = rec['created_at']
+            nobj.user_id = rec['user_id']
+            nobj.screen_name = rec['screen_name']
+        return nobj
+
+    def clone(self):
+        nobj = tweetMentionObj()
+        if( self.rid > 0 ):
+            nobj.rid = self.rid
+        nobj.tweet_id = self.tweet_id
+        nobj.created_at = self.created_at
+        nobj.user_id = self.user_id
+        nobj.screen_name = self.screen_name
+        return nobj
+
+    def __repr__(self):
+        return "<tweetMentionObj('%s','%s','%s','%s',%r)>"%(str(self.rid),str(self.tweet_id),str(self.created_at),str(self.user_id),self.screen_name)
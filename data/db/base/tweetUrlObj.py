@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# 
+#   FILE: tweetUrlObj.py
+#
+#   An object that mirrors the tweet_urls table in the database.
+#   One url of a tweet, as given by the Twitter API entities.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+#
+from datetime import datetime
+import copy
+
+class tweetUrlObj(object):
+    def __init__(self):
+        self.rid = None
+        self.tweet_id = 0
+        self.created_at = datetime(2000,1,1,0,0,0,0)
+        self.url = u""
+        self.expanded_url = u""
+
+
+    def to_dict(self):
+        rec = {}
+        if( self.rid > 0 ):
+            rec['rid'] = self.rid
+        rec['tweet_id'] = self.tweet_id
+        rec['created_at'] = self.created_at
+        rec['url'] = self.url
+        rec['expanded_url'] = self.expanded_url
+        return rec
+
+    def from_dict(self, rec):
+        nobj = tweetUrlObj()
+        if( rec ):
+            nobj.tweet_id = rec['tweet_id']
+            nobj.created_at = rec['created_at']
+            nobj.url = rec['url']
+            nobj.expanded_url = rec['expanded_url']
+        return nobj
+
+    def clone(self):
+        nobj = tweetUrlObj()
+        if( self.rid > 0 ):
+            nobj.rid = self.rid
+        nobj.tweet_id = self.tweet_id
+        nobj.created_at = self.created_at
+        nobj.url = self.url
+        nobj.expanded_url = self.expanded_url
+        return nobj
+
+    def __repr__(self):
+        return "<tweetUrlObj('%s','%s','%s',%r,%r)>"%(str(self.rid),str(self.tweet_id),str(self.created_at),self.url,self.expanded_url)
@@ -82,4 +82,39 @@ ALTER TABLE `twitter_followers` ADD INDEX `user_index` (`user`);
 ALTER TABLE `twitter_followers` ADD INDEX `user_id_index` (`user_id`);
 ALTER TABLE `twitter_followers` ADD INDEX `user_local_index` (`user_local_id`);
 ALTER TABLE `twitter_followers` ADD INDEX `follower_index` (`follower_id`);
+
+##  Entities of each tweet as given by the Twitter API at collection
+##  time, one row per hashtag, mention or url. created_at is copied
+##  from the tweet so date range counts don't need a join.
+CREATE TABLE `twitter_tweet_hashtags` (
+  `rid` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `tweet_id` BIGINT UNSIGNED DEFAULT NULL,
+  `created_at` datetime DEFAULT NULL,
+  `hashtag` VARCHAR(140) CHARACTER SET 'utf8' COLLATE 'utf8_general_ci' DEFAULT NULL
+) ENGINE=MyISAM DEFAULT CHARACTER SET 'utf8' COLLATE 'utf8_general_ci';
+ALTER TABLE `twitter_tweet_hashtags` ADD INDEX `tweet_index` (`tweet_id`);
+ALTER TABLE `twitter_tweet_hashtags` ADD INDEX `hashtag_index` (`hashtag`,`created_at`);
+ALTER TABLE `twitter_tweet_hashtags` ADD INDEX `creation_index` (`created_at`);
+
+CREATE TABLE `twitter_tweet_mentions` (
+  `rid` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `tweet_id` BIGINT UNSIGNED DEFAULT NULL,
+  `created_at` datetime DEFAULT NULL,
+  `user_id` BIGINT UNSIGNED DEFAULT NULL,
+  `screen_name` VARCHAR(64) CHARACTER SET 'utf8' COLLATE 'utf8_general_ci' DEFAULT NULL
+) ENGINE=MyISAM DEFAULT CHARACTER SET 'utf8' COLLATE 'utf8_general_ci';
+ALTER TABLE `twitter_tweet_mentions` ADD INDEX `tweet_index` (`tweet_id`);
+ALTER TABLE `twitter_tweet_mentions` ADD INDEX `screen_index` (`screen_name`,`created_at`);
+ALTER TABLE `twitter_tweet_mentions` ADD INDEX `id_index` (`user_id`);
+ALTER TABLE `twitter_tweet_mentions` ADD INDEX `creation_index` (`created_at`);
+
+CREATE TABLE `twitter_tweet_urls` (
+  `rid` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  `tweet_id` BIGINT UNSIGNED DEFAULT NULL,
+  `created_at` datetime DEFAULT NULL,
+  `url` VARCHAR(256) CHARACTER SET 'utf8' DEFAULT NULL,
+  `expanded_url` VARCHAR(1024) CHARACTER SET 'utf8' DEFAULT NULL
+) ENGINE=MyISAM DEFAULT CHARACTER SET 'utf8' COLLATE 'utf8_general_ci';
+ALTER TABLE `twitter_tweet_urls` ADD INDEX `tweet_index` (`tweet_id`);
+ALTER TABLE `twitter_tweet_urls` ADD INDEX `creation_index` (`created_at`);
 COMMIT;
@@ -0,0 +1,255 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: bench_ingest.py
+#   DATE: October, 2026
+#
+#   Benchmark of saving pages of Twitter API tweets, the old per tweet
+#   save_tweet() and save_user() of collect_tweets.py, two queries and
+#   two inserts for every tweet, against the bulk insert_tweet_page()
+#   of TweetsDB, one IN query and one executemany per table and page.
+#   A SQLite file stands in for the MySQL collection database, so only
+#   the relative numbers mean anything. The pages repeat tweets and
+#   users, like overlapping search results do, and the row counts of
+#   the two databases are compared at the end.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, sys, time, random, sqlite3, tempfile
+from datetime import datetime, timedelta
+from sochi.data.db.base.dbConfig import DBConfiguration
+from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB
+
+# The collection tables, in SQLite's dialect, with the query_source
+# column of the example tweet table
+SQLITE_SCHEMA = """
+CREATE TABLE twitter_tweets (rid INTEGER PRIMARY KEY AUTOINCREMENT, tweet_id BIGINT,
+    tweet_id_str VARCHAR(64), created_at DATETIME, from_user_id BIGINT, from_user VARCHAR(64),
+    from_user_name VARCHAR(64), lat DECIMAL(25,16), lon DECIMAL(25,16), tweet_text VARCHAR(256),
+    query_source VARCHAR(256));
+CREATE INDEX tweet_index ON twitter_tweets(tweet_id);
+CREATE TABLE twitter_users (rid INTEGER PRIMARY KEY AUTOINCREMENT, user_name VARCHAR(64),
+    screen_name VARCHAR(64), user_id BIGINT, join_dt DATETIME, verified BOOLEAN,
+    geo_enabled BOOLEAN, location VARCHAR(64), lang VARCHAR(8), time_zone VARCHAR(64),
+    url VARCHAR(256), description VARCHAR(256));
+CREATE INDEX user_name_index ON twitter_users(user_name);
+CREATE INDEX user_id_index ON twitter_users(user_id);
+CREATE TABLE twitter_user_meta (rid INTEGER PRIMARY KEY AUTOINCREMENT, user_name VARCHAR(64),
+    screen_name VARCHAR(64), user_id BIGINT, friend_count BIGINT, follower_count BIGINT,
+    profile_collect_dt DATETIME, friend_collect_dt DATETIME, friend_collect_resp VARCHAR(32),
+    follower_collect_dt DATETIME, follower_collect_resp VARCHAR(32));
+CREATE TABLE twitter_friends (rid INTEGER PRIMARY KEY AUTOINCREMENT, user VARCHAR(64),
+    friend VARCHAR(64), user_id BIGINT, friend_id BIGINT, user_local_id BIGINT,
+    friend_local_id BIGINT);
+CREATE TABLE twitter_followers (rid INTEGER PRIMARY KEY AUTOINCREMENT, user VARCHAR(64),
+    follower VARCHAR(64), user_id BIGINT, follower_id BIGINT, user_local_id BIGINT,
+    follower_local_id BIGINT);
+CREATE TABLE twitter_tweet_hashtags (rid INTEGER PRIMARY KEY AUTOINCREMENT, tweet_id BIGINT,
+    created_at DATETIME, hashtag VARCHAR(140));
+CREATE TABLE twitter_tweet_mentions (rid INTEGER PRIMARY KEY AUTOINCREMENT, tweet_id BIGINT,
+    created_at DATETIME, user_id BIGINT, screen_name VARCHAR(64));
+CREATE TABLE twitter_tweet_urls (rid INTEGER PRIMARY KEY AUTOINCREMENT, tweet_id BIGINT,
+    created_at DATETIME, url VARCHAR(256), expanded_url VARCHAR(1024));
+"""
+
+COUNT_TABLES = ["twitter_tweets","twitter_users","twitter_tweet_hashtags",
+                "twitter_tweet_mentions","twitter_tweet_urls"]
+
+
+def new_db(fname=None):
+    con = sqlite3.connect(fname)
+    con.executescript(SQLITE_SCHEMA)
+    con.close()
+    config = DBConfiguration(protocol="sqlite", db_name=fname)
+    return ExampleTweetsDB(config=config)
+
+
+##
+# The rows in the tables, counted in the session of the database object.
+# commit_changes() only flushes (the MyISAM tables of the collection
+# don't have transactions), so with SQLite the rows are only there until
+# the session goes away.
+#
+def table_counts(db=None):
+    return [db.session.execute("SELECT COUNT(*) FROM %s"%(t)).scalar() for t in COUNT_TABLES]
+
+
+##
+# The original collect_tweets.py save_user() and save_tweet(), without
+# the prints and the 4 byte utf-8 cleaning
+#
+def old_save_user(db=None, tweet=None):
+    if( tweet and (type(tweet) is dict) ):
+        uname = tweet['user']['screen_name'].encode('utf-8')
+        ulist = db.query_user_table_by_username(uname)
+        if( len(ulist) > 0 ):
+            return
+        rec = db.new_user_table_item(None)
+        username = tweet['user']['screen_name'].encode('utf-8')
+        rec.user_name = username
+        rec.screen_name = tweet['user']['name'].encode('utf-8')
+        rec.user_id = long(tweet['user']['id_str'])
+        db.insert_item(rec)
+    return
+
+
+def old_save_tweet(db=None, tweet=None, source=""):
+    if( tweet and (type(tweet) is dict) ):
+        rlist = db.query_tweet_table_by_tweet_id(str(tweet['id']))
+        if( len(rlist) > 0 ):
+            return
+        rec = db.new_tweet_table_item(None)
+        rec.tweet_id = tweet['id']
+        rec.tweet_id_str = tweet['id_str']
+        ts = tweet['created_at'].rpartition(' ')[0]
+        yr = tweet['created_at'].rpartition(' ')[2]
+        ts = ts.rpartition(' ')[0]
+        dstr = ts+" "+yr
+        created_dt = datetime.strptime(dstr,"%a %b %d %H:%M:%S %Y")
+        rec.created_at = created_dt
+        rec.from_user_name = tweet['user']['name'].encode('utf-8')
+        rec.from_user = tweet['user']['screen_name'].encode('utf-8')
+        rec.from_user_id = long(tweet['user']['id_str'])
+        rec.tweet_text = tweet['text']
+        rec.query_source = source
+        if( tweet['geo'] ):
+            geo = tweet['geo']
+            if( (geo['type']=="Point") or (geo['type']=="point") ):
+                coord = geo['coordinates']
+                rec.lat = coord[0]
+                rec.lon = coord[1]
+        db.insert_item(rec)
+        db.insert_tweet_entities(tweet_id=rec.tweet_id, created_at=created_dt,
+                                 entities=tweet.get('entities'))
+    return
+
+
+def old_save_page(db=None, tweets=None, source=""):
+    for tweet in tweets:
+        old_save_tweet(db=db, tweet=tweet, source=source)
+        old_save_user(db=db, tweet=tweet)
+
+
+def new_save_page(db=None, tweets=None, source=""):
+    db.insert_tweet_page(statuses=tweets, source=source)
+
+
+##
+# Generates pages of API tweets. A page repeats a share of the tweets
+# of the pages before it, and the tweets come from a limited set of
+# users, so both kinds of duplicate checks find something.
+#
+def synthetic_pages(pages=200, page_size=100, users=2000, repeat=0.2, seed=547):
+    rnd = random.Random(seed)
+    start = datetime(2014,2,7)
+    tags = [u"Sochi2014",u"olympics",u"hockey",u"WeAreTeamUSA",u"Сочи2014"]
+    seen = []
+    result = []
+    next_id = 434000000000000000
+    for p in xrange(pages):
+        page = []
+        for i in xrange(page_size):
+            if( seen and rnd.random()<repeat ):
+                page.append(rnd.choice(seen))
+                continue
+            next_id += rnd.randint(1,1000)
+            uid = rnd.randint(1,users)
+            created = start+timedelta(seconds=rnd.randint(0,17*86400))
+            entities = {'hashtags':[{'text':t} for t in rnd.sample(tags,rnd.randint(0,2))],
+                        'user_mentions':[],
+                        'urls':[]}
+            if( rnd.random()<0.3 ):
+                mid = rnd.randint(1,users)
+                entities['user_mentions'].append({'id_str':str(mid),'screen_name':u"user%d"%(mid)})
+            if( rnd.random()<0.2 ):
+                entities['urls'].append({'url':u"http://t.co/%07x"%(rnd.randint(0,1<<28)),
+                                         'expanded_url':u"http://sochi2014.com/"})
+            geo = None
+            if( rnd.random()<0.05 ):
+                geo = {'type':u"Point",'coordinates':[43.6+rnd.random(),39.7+rnd.random()]}
+            tweet = {'id':next_id,
+                     'id_str':str(next_id),
+                     'created_at':created.strftime("%a %b %d %H:%M:%S +0000 %Y"),
+                     'user':{'id_str':str(uid),'screen_name':u"user%d"%(uid),
+                             'name':u"User Number %d"%(uid)},
+                     'text':u"watching the games #%s @user%d"%(rnd.choice(tags),uid),
+                     'geo':geo,
+                     'entities':entities}
+            page.append(tweet)
+            seen.append(tweet)
+        result.append(page)
+    return result
+
+
+def timed(name=None, func=None, pages=None):
+    fd, fname = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(fname)
+    db = new_db(fname)
+    tweets = sum([len(p) for p in pages])
+    start = time.time()
+    for page in pages:
+        func(db=db, tweets=page, source="bench")
+        db.commit_changes()
+    secs = time.time()-start
+    counts = table_counts(db)
+    db.close()
+    os.remove(fname)
+    print "  %-24s %7d tweets %8.3fs %8.1f tweets/s"%(name,tweets,secs,tweets/max(secs,0.000001))
+    return counts
+
+
+def bench(pages=None):
+    print "%d pages of %d tweets"%(len(pages),len(pages[0]))
+    old = timed("per tweet save_tweet",old_save_page,pages)
+    new = timed("insert_tweet_page",new_save_page,pages)
+    print "  rows (%s)"%(", ".join(COUNT_TABLES))
+    print "    old: %s"%(old)
+    print "    new: %s"%(new)
+    if( old!=new ):
+        print "  row counts differ!"
+    return
+
+
+def parse_params(argv):
+    pages = 200
+    size = 100
+    users = 2000
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-pages"):
+            pc += 1
+            pages = int(argv[pc])
+        if( param == "-page_size"):
+            pc += 1
+            size = int(argv[pc])
+        if( param == "-users"):
+            pc += 1
+            users = int(argv[pc])
+        pc += 1
+    return {'pages':pages, 'page_size':size, 'users':users }
+
+
+def usage(prog):
+    print "USAGE: %s [-pages <n>] [-page_size <n>] [-users <n>]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python bench_ingest.py
+#   python bench_ingest.py -pages 1000 -users 50000
+
+def main(argv):
+    if( "-h" in argv or "-help" in argv ):
+        usage(argv[0])
+    params = parse_params(argv)
+    bench(synthetic_pages(pages=params['pages'], page_size=params['page_size'],
+                          users=params['users']))
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
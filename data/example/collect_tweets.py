@@ -10,7 +10,7 @@
 #   Copyright by Author. All rights reserved. Not for reuse without
 #   express permissions.
 #
-import sys, json, time, re
+import sys, json, re
 from datetime import datetime
 from sochi.data.db.base.dbConfig import DBConfiguration
 from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
@@ -44,7 +44,10 @@ def collection_loop(db=None, twit=None, term=None):
     mesg_count = 0
     total_tweets = 0
     while( twit.messages()>0 or twit.query_in_process() ):
-        message_list = twit.get_message()
+        # blocks until a page arrives or the query is done
+        message_list = twit.get_message(block=True)
+        if( message_list is None ):
+            continue
         mesg_count += 1
         if( message_list ):
             total_tweets = total_tweets + len(message_list)
@@ -53,14 +56,27 @@ def collection_loop(db=None, twit=None, term=None):
                 tweet_count += 1
                 #dump_json(rec=tweet,mesg_count=mesg_count,tweet_count=tweet_count)
                 dump_tweet(rec=tweet,mesg_count=mesg_count,tweet_count=tweet_count)
-                source = "command_line:%s"%(str(term))
-                save_tweet(db=db, tweet=tweet, source=source)
-                save_user(db=db, tweet=tweet)
-        while( twit.messages()<1 and twit.query_in_process() ):
-            time.sleep(2)
+            source = "command_line:%s"%(str(term))
+            save_page(db=db, tweets=message_list, source=source)
     db.commit_changes()
     return
 
+
+##
+# Saves a whole page of tweets, and their users, with the bulk insert of
+# the database. One query finds the tweets of the page that are already
+# saved, where save_tweet() and save_user() query once per tweet.
+#
+def save_page(db=None, tweets=None, source=""):
+    # the 4 byte utf-8 cleaning of save_tweet() and save_entities()
+    clean = lambda text: utf8_acceptable.sub(u'',text)
+    counts = db.insert_tweet_page(statuses=tweets, source=source, text_filter=clean)
+    print "\tSaved %d tweets (%d already saved), %d new users"%(counts['tweets'],
+                                                                counts['known_tweets'],
+                                                                counts['users'])
+    return counts
+
+
 def save_user(db=None, tweet=None):
     if( tweet and (type(tweet) is dict) ):
         uname = tweet['user']['screen_name'].encode('utf-8')
@@ -125,16 +141,34 @@ def save_tweet(db=None, tweet=None, source=""):
             else:
                 print "\tUnexpected Geo type: ",str(geo)
         db.insert_item(rec)
+        save_entities(db=db, tweet_id=rec.tweet_id, created_at=created_dt,
+                      entities=tweet.get('entities'))
     else:
         print "NOT a tweet dictionary:",type(tweet)
     return
 
 
+##
+# Keeps the hashtags, mentions and urls the API found in the tweet, so
+# they don't have to be parsed out of the text later. Skipped when the
+# database does not have the entity tables.
+#
+def save_entities(db=None, tweet_id=None, created_at=None, entities=None):
+    if( not entities or not db.has_entity_tables() ):
+        return 0
+    # same 4 byte utf-8 problem as the tweet text
+    for ht in (entities.get('hashtags') or []):
+        ht['text'] = utf8_acceptable.sub(u'',ht['text'])
+    return db.insert_tweet_entities(tweet_id=tweet_id, created_at=created_at,
+                                    entities=entities)
+
+
 def parse_params(argv):
     auth = None
     user = None
     query = None
     size = 100
+    queue = "block"     # full message queue policy, see Base.set_queue_policy()
 
     continuation = False
     debug = False
@@ -154,6 +188,9 @@ def parse_params(argv):
         if( param == "-page_size"):
             pc += 1
             size = int(argv[pc])
+        if( param == "-queue"):
+            pc += 1
+            queue = argv[pc]
         
         if( param == "-cont"):
             continuation = True
@@ -164,11 +201,11 @@ def parse_params(argv):
         pc += 1
 
     return {'auth':auth, 'user':user,
-            'query':query, 'json':json, 'page_size':size,
+            'query':query, 'json':json, 'page_size':size, 'queue':queue,
             'use_continuations':continuation, 'debug':debug }
 
 def usage(argv):
-    print "USAGE: python %s -auth <appname> -user <auth_user> -query \"<query_terms>\" [-page_size <n>] [-cont] [-debug] [-json]"%(argv[0])
+    print "USAGE: python %s -auth <appname> -user <auth_user> -query \"<query_terms>\" [-page_size <n>] [-queue block|spill|drop_oldest|drop] [-cont] [-debug] [-json]"%(argv[0])
     sys.exit(0)
 
 
@@ -181,6 +218,8 @@ def main(argv):
     twit = Search()
     twit.set_user_agent(agent="random")
     twit.set_throttling(True)
+    # the DB writer is slower than the search thread, don't lose pages
+    twit.set_queue_policy(policy=p['queue'])
 
     lg = None
     if( not p['auth'] and not p['user'] ):
@@ -217,6 +256,8 @@ def main(argv):
     twit.set_query_result_type(rt="recent")
     twit.set_page_size(sz=p['page_size'])
     #twit.set_page_size(sz=5)
+    # ask for the structured hashtags, mentions and urls
+    twit.set_include_entities(True)
 
     db_config = DBConfiguration(db_settings=DATABASE_SETTINGS['main_db'])
     db = ExampleTweetsDB(config=db_config)
@@ -226,6 +267,7 @@ def main(argv):
     twit.wait_request()
 
     collection_loop(db=db,twit=twit)
+    print "Message queue:",twit.queue_stats()
 
     return
 
@@ -12,17 +12,18 @@
 #   express permissions.
 #
 import sys, gc, time, string, json, pickle, random
+from itertools import islice
 from datetime import datetime, timedelta
-from infx.data.db.base.dbConfig import DBConfiguration
-from infx.data.db.fitness.settings_db import *
-from infx.data.db.fitness.FitTweetsDB import FitTweetsDB as DB
-from infx.data.db.fitness.FitTweetObj import FitTweetObj
-from infx.utils.tweet_entities import tweet_entities
-from infx.utils.stop_words import remove_stops
-from infx.data.fitness.constants import *
+from sochi.data.db.base.dbConfig import DBConfiguration
+from sochi.data.db.sochi.settings_db import *
+from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
+from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
+from sochi.utils.tweet_entities import tweet_entities
+from sochi.utils.stop_words import remove_stops
+from sochi.data.sochi.constants import *
+from sochi.data.sochi.tweet_stream import stream_tweets
 
 def query_date(db=None, date=None, dur=1, by_hour=False):
-    result_list = []
     if( by_hour ):
         delta = timedelta(hours=1)
     else:
@@ -32,15 +33,10 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
     end_date = dt2.strftime("%Y%m%d%H%M%S")
     #start_date = date.strftime("%Y%m%d000000")
     #end_date = dt2.strftime("%Y%m%d000000")
-    try:
-        result_list = db.query_tweet_table_by_date_range(start_date=start_date,
-                                                         end_date=end_date,
-                                                         in_order=True)
-    except Exception, e:
-        print "EXCEPTION when running query!"
-        print e
-        result_list = []
-    return {'tweet_list':result_list, 
+    tweets = db.iter_tweet_table_by_date_range(start_date=start_date,
+                                               end_date=end_date,
+                                               in_order=True)
+    return {'tweets':stream_tweets(tweets), 
             'query_date':date, 
             'start_date_str':start_date, 
             'end_date_str':end_date,
@@ -49,21 +45,24 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
 
 def tweet_dump(db=None, start_date=None, dur=1, items=-1, obj=False, report=False):
     
-    # query the database to get a set (list) of tweets
+    # query the database to get a stream of tweets
     result = query_date(db=db, date=start_date, dur=dur)
-    tweet_list = result['tweet_list']
+    tweets = result['tweets']
     
     total_tweets = 0
     if( report ):
-        total_tweets = len(tweet_list)
+        # count them with the database, the stream can't be counted
+        # without reading it
+        total_tweets = db.count_tweet_table_by_date_range(start_date=result['start_date_str'],
+                                                          end_date=result['end_date_str'])
         print "Found %d tweets."%(total_tweets)
     
     if( items>0 ):
-        tweet_list = tweet_list[:items]
+        tweets = islice(tweets,items)
     
-    # now iterate through the list of the tweet objects
+    # now iterate through the tweet objects as they are read
     counter = 0
-    for tweet in tweet_list:
+    for tweet in tweets:
         counter+=1
         print "Tweet [%6d]:"%counter
         if( obj ):
@@ -84,7 +83,9 @@ def tweet_dump(db=None, start_date=None, dur=1, items=-1, obj=False, report=Fals
             ttext = tweet.tweet_text.replace("\n","").replace("\r","")
             print "tweet_text(%s)"%(type(tweet.tweet_text)),ttext.encode('utf-8')
         print
-        
+    # the stream is still open when only some of the items were read
+    result['tweets'].close()
+
     if( report ):
         print "Found %d tweets."%(total_tweets)
         print "Dumped %d tweets."%(counter)
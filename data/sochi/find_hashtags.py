@@ -11,16 +11,22 @@
 #   express permissions.
 #
 import sys, gc, time, string, json, pickle, random
+from itertools import izip, islice
 from datetime import datetime, timedelta
 from sochi.data.db.base.dbConfig import DBConfiguration
 from sochi.data.db.sochi.settings_db import *
 from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
 from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
-from sochi.utils.tweet_entities import tweet_entities
-from sochi.data.fitness.constants import *
+from sochi.utils.tweet_entities import tweet_entities_batch
+from sochi.utils.entity_cache import EntityCache
+from sochi.data.sochi.tweet_columns import TweetColumnStore
+from sochi.data.sochi.constants import *
+from sochi.data.sochi.tweet_stream import stream_tweets
+
+# tweets read from the stream and run through the entity extraction at a time
+ENTITY_BATCH_SIZE = 20000
 
 def query_date(db=None, date=None, dur=1, by_hour=False):
-    result_list = []
     if( by_hour ):
         delta = timedelta(hours=1)
     else:
@@ -30,45 +36,49 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
     end_date = dt2.strftime("%Y%m%d%H%M%S")
     #start_date = date.strftime("%Y%m%d000000")
     #end_date = dt2.strftime("%Y%m%d000000")
-    try:
-        result_list = db.query_tweet_table_by_date_range(start_date=start_date,
-                                                         end_date=end_date,
-                                                         in_order=True)
-    except Exception, e:
-        print "EXCEPTION when running query!"
-        print e
-        result_list = []
-    return {'tweet_list':result_list, 
+    # only the text (and the id for the entity cache) is read, as rows
+    tweets = db.iter_tweet_columns_by_date_range(columns=('tweet_id','tweet_text'),
+                                                 start_date=start_date,
+                                                 end_date=end_date)
+    return {'tweets':stream_tweets(tweets), 
             'query_date':date, 
             'start_date_str':start_date, 
             'end_date_str':end_date,
             'duration':dur}
 
 
-def find_hashtags(db=None, start_date=None, dur=1, report=False):
+def find_hashtags(db=None, start_date=None, dur=1, workers=1, cache=None, report=False):
     hashtag_dict = {}
     
-    # query the database to get a set (list) of tweets
+    # query the database to get a stream of tweets
     result = query_date(db=db, date=start_date, dur=dur)
-    tweet_list = result['tweet_list']
-    
-    if( report ):
-        print "Found %d tweets."%(len(tweet_list))
+    tweets = result['tweets']
     
-    # now iterate through the list of the tweet objects
-    for tweet in tweet_list:
-        tweet_stuff = tweet_entities(tweet_text=tweet.tweet_text)
-        tweet_hashes = tweet_stuff['hashes']
-        #if( report and tweet_hashes ):
-        #    print tweet_hashes
-        for hashtag in tweet_hashes:
-            if( hashtag in hashtag_dict ):
-                hash_list = hashtag_dict[hashtag]
-                hash_list.append( tweet )
-            else:
-                hashtag_dict[hashtag] = [tweet]
+    # extract the hashes a batch of tweets at a time, then walk the
+    # tweet objects of the batch along with them, so only the batch
+    # and the tweets kept in the hashtag_dict are in memory
+    tweet_count = 0
+    batch = list(islice(tweets,ENTITY_BATCH_SIZE))
+    while( batch ):
+        tweet_count += len(batch)
+        if( cache ):
+            entities = cache.entities_batch(batch, workers=workers, fields="hashes")
+        else:
+            entities = tweet_entities_batch([tweet.tweet_text for tweet in batch],
+                                            workers=workers, fields="hashes")
+        for tweet, tweet_hashes in izip(batch, entities):
+            #if( report and tweet_hashes ):
+            #    print tweet_hashes
+            for hashtag in tweet_hashes:
+                if( hashtag in hashtag_dict ):
+                    hash_list = hashtag_dict[hashtag]
+                    hash_list.append( tweet )
+                else:
+                    hashtag_dict[hashtag] = [tweet]
+        batch = list(islice(tweets,ENTITY_BATCH_SIZE))
         
     if( report ):
+        print "Found %d tweets."%(tweet_count)
         print "Found %d unique hashtags"%(len(hashtag_dict))
         
     return hashtag_dict
@@ -84,6 +94,20 @@ def order_hashtags(hashtag_dict=None):
     return ordered_tags
 
 
+##
+# Counts the hashtags of a date range with the entity tables kept at
+# collection time, one indexed GROUP BY instead of a pass over the text.
+# Returns (hashtag, count) pairs, most used first, like order_hashtags().
+#
+def count_hashtags(db=None, start_date=None, dur=1, report=False):
+    end_date = start_date + timedelta(days=dur)
+    counts = db.count_hashtags_by_date_range(start_date=start_date.strftime("%Y%m%d%H%M%S"),
+                        end_date=end_date.strftime("%Y%m%d%H%M%S"))
+    ranked = [(u"#"+item, count) for item, count in counts]
+    if( report ):
+        print "Found %d unique hashtags"%(len(ranked))
+    return ranked
+
 def parse_date(dstr=None):
     date = None
     try:
@@ -106,6 +130,10 @@ def parse_params(argv):
     dur = 1            # duration
     report = True      # report progress
     pickle = False     # pickle the result
+    workers = 1        # entity extraction processes, 0 uses one per cpu
+    sql = False        # count with the entity tables instead of the text
+    cache = None       # entity cache file, keeps the extracted entities
+    columns = None     # directory of exported columns files, read instead of the DB
     pc = 1
     while( pc < len(argv) ):
         param = argv[pc]
@@ -116,6 +144,17 @@ def parse_params(argv):
         if( param == "-dur"):
             pc += 1
             dur = int(argv[pc])
+        if( param == "-workers"):
+            pc += 1
+            workers = int(argv[pc])
+        if( param == "-cache"):
+            pc += 1
+            cache = argv[pc]
+        if( param == "-columns"):
+            pc += 1
+            columns = argv[pc]
+        if( param == "-sql"):
+            sql = True
         if( param == "-pickle"):
             pickle = True
         if( param == "-report"):
@@ -123,11 +162,13 @@ def parse_params(argv):
         if( param == "-no_report"):
             report = False
         pc += 1
-    return {'date':dt, 'dt_str':dt_str, 'report':report, 'pickle':pickle, 'duration':dur }
+    return {'date':dt, 'dt_str':dt_str, 'report':report, 'pickle':pickle, 'duration':dur,
+            'workers':workers, 'sql':sql, 'cache':cache,
+            'columns':columns }
 
 
 def usage(prog):
-    print "USAGE: %s -date <date> [-dur <days>] [-pickle] [-report | -no_report]"%(prog)
+    print "USAGE: %s -date <date> [-dur <days>] [-workers <n>] [-cache <file> | -sql] [-columns <dir>] [-pickle] [-report | -no_report]"%(prog)
     sys.exit(0)
 
 
@@ -136,6 +177,10 @@ def usage(prog):
 #   python find_hashtags.py -date 20130101
 #   python find_hashtags.py -date 20130201 -dur 2 -pickle
 #   python find_hashtags.py -date 20130301 -pickle -no_report
+#   python find_hashtags.py -date 20130201 -dur 7 -workers 8
+#   python find_hashtags.py -date 20130201 -dur 7 -sql
+#   python find_hashtags.py -date 20130201 -dur 7 -cache entities.cache
+#   python find_hashtags.py -date 20130201 -dur 7 -columns columns
 
 def main(argv):
     if len(argv) < 3:
@@ -155,27 +200,51 @@ def main(argv):
         print config
         print "Opening Database"
     
-    # Open the database with the specific configuration
-    db = DB(config=config)
+    # Open the database with the specific configuration, or read the
+    # tweets from the files exported by tweet_columns.py
+    if( params['columns'] and not params['sql'] ):
+        db = TweetColumnStore(params['columns'])
+    else:
+        db = DB(config=config)
+
+    cache = None
+    if( params['cache'] and not params['sql'] ):
+        cache = EntityCache(fname=params['cache'])
         
-    htd = find_hashtags(db=db,start_date=params['date'],
-                          dur=params['duration'],
-                          report=params['report'])
+    if( params['sql'] ):
+        ranked = count_hashtags(db=db,start_date=params['date'],
+                                dur=params['duration'],
+                                report=params['report'])
+        # only the counts come back from the entity tables
+        htd = dict(ranked)
+        fname_prefix = "hashtag_counts-"
+    else:
+        htd = find_hashtags(db=db,start_date=params['date'],
+                            dur=params['duration'],
+                            workers=params['workers'],
+                            cache=cache,
+                            report=params['report'])
+        fname_prefix = "hashtag_dict-"
+        if( params['report'] ):
+            ranked = order_hashtags(hashtag_dict=htd)
 
     if( params['report'] ):
-        ranked = order_hashtags(hashtag_dict=htd)
         for item in ranked:
-            #print "%5d: %s"%(item[1],item[0])
             print "%5d:"%(item[1]),item[0].encode('utf-8')
 
     # Pickle the resulting hashtag dictionary
     if( params['pickle'] ):
         dt_str = params['date'].strftime("%Y%m%d")
-        fname = "hashtag_dict-"+dt_str+"-dur%02d"%(params['duration'])+".pickle"
+        fname = fname_prefix+dt_str+"-dur%02d"%(params['duration'])+".pickle"
         pf = open(fname,"w")
         pickle.dump(htd,pf)
         pf.close()
     
+    if( cache ):
+        if( params['report'] ):
+            print "Entity cache:",cache.stats()
+        cache.close()
+
     # Always remember to close the DB when you're done
     db.close()
     return
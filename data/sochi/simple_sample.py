@@ -18,6 +18,7 @@ from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
 from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
 from sochi.utils.tweet_entities import tweet_entities
 from sochi.data.sochi.constants import *
+from sochi.data.sochi.tweet_stream import stream_tweets
 import csv
 
 
@@ -46,7 +47,6 @@ def next_day(dt=None, dt_str=None):
     return {'dt':new_dt, 'dt_str':new_dt_str}
 
 def query_date(db=None, date=None, dur=1, by_hour=False):
-    result_list = []
     if( by_hour ):
         delta = timedelta(hours=1)
     else:
@@ -56,44 +56,53 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
     end_date = dt2.strftime("%Y%m%d%H%M%S")
     #start_date = date.strftime("%Y%m%d000000")
     #end_date = dt2.strftime("%Y%m%d000000")
-    try:
-        result_list = db.query_tweet_table_by_date_range(start_date=start_date,
-                                                         end_date=end_date,
-                                                         in_order=True)
-    except Exception, e:
-        print "EXCEPTION when running query!"
-        print e
-        result_list = []
-    return {'tweet_list':result_list, 
+    # only the text is read, as rows
+    tweets = db.iter_tweet_columns_by_date_range(columns=('tweet_text',),
+                                                 start_date=start_date,
+                                                 end_date=end_date,
+                                                 in_order=True)
+    return {'tweets':stream_tweets(tweets), 
             'query_date':date, 
             'start_date_str':start_date, 
             'end_date_str':end_date,
             'duration':dur}
 
 
-def sample_tweets(tweet_list=None, samples=None, day=None, report=False):
+##
+# Picks samples tweets at random from the stream of a day's tweets,
+# with a reservoir, so the day is read once and only the samples are
+# kept. Like picking from the whole list, every tweet is equally likely
+# and none is picked twice.
+#
+def sample_tweets(tweets=None, samples=None, day=None, report=False):
     result_list = []
-    f = open("record.csv", "a")
-    if( len(tweet_list)<=samples ):
-        result_list=tweet_list
+    tweet_count = 0
+    for tweet in tweets:
+        if( tweet_count<samples ):
+            result_list.append(tweet)
+        else:
+            random_index = random.randint(0,tweet_count)
+            if( random_index<samples ):
+                result_list[random_index] = tweet
+        tweet_count += 1
+    if( report ):
+        print "\tTweets this day:",tweet_count
+    if( tweet_count<=samples ):
         if( report ):
             print "\tFewer tweets this day than samples, returning all!"
-    else:
-        count = 0
-        while( count < samples):
-            random_index = random.randint(0,(len(tweet_list)-1))
-            tweet = tweet_list[random_index]
-            #tweetwriter = csv.DictWriter(f, delimiter=',')
-            f.write(tweet.tweet_text.encode('utf-8'))
-            f.write("\n")
-            #tweetwriter.writerows(tweet.tweet_text.encode('utf-8'))
-            if( report ):
-                print "\t[%d:%d]>>"%(day,count),
-                print tweet.tweet_text.encode('utf-8')
-                #print tweet
-            result_list.append(tweet)
-            del tweet_list[random_index]
-            count += 1
+        return result_list
+    f = open("record.csv", "a")
+    count = 0
+    for tweet in result_list:
+        #tweetwriter = csv.DictWriter(f, delimiter=',')
+        f.write(tweet.tweet_text.encode('utf-8'))
+        f.write("\n")
+        #tweetwriter.writerows(tweet.tweet_text.encode('utf-8'))
+        if( report ):
+            print "\t[%d:%d]>>"%(day,count),
+            print tweet.tweet_text.encode('utf-8')
+            #print tweet
+        count += 1
     f.flush()
     f.close()
     return result_list
@@ -113,10 +122,7 @@ def process_week(db=None, week=0, p=None, report=True):
             if( report ):
                 print "Processing Day:",str(current_dt)
             result = query_date(db=db,date=current_dt,dur=1)
-            tweet_list = result['tweet_list']
-            if( report ):
-                print "\tTweets this day:",len(tweet_list)
-            sample_list = sample_tweets(tweet_list=tweet_list, samples=p['samples'],
+            sample_list = sample_tweets(tweets=result['tweets'], samples=p['samples'],
                                         day=day, report=report)
             next_dt_rec = next_day(dt=current_dt)
             current_dt = next_dt_rec['dt']
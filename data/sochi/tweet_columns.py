@@ -0,0 +1,483 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: tweet_columns.py
+#   DATE: October, 2026
+#
+#   Exports the tweet table to local columnar files, one file per day,
+#   in a directory per week of the WEEKS calendar, and reads them back
+#   memory mapped. The analyses keep asking the database for the same
+#   days; once a week is exported they can read it from the files at
+#   disk speed.
+#
+#   A file is an array file of utils/array_file.py, like the sentiment
+#   model file, with one array per column used in place from the
+#   read-only mmap. Like Arrow, a text column is an array of
+#   offsets into one array of utf-8 bytes. The rows are in created_at
+#   order, the date columns hold seconds since the epoch.
+#
+#   TweetColumnStore reads a directory of these files with the same
+#   iter_tweet_columns_by_date_range() as TweetsDB, so the data/sochi
+#   scripts can take a store in place of the database.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, sys, calendar, time
+import numpy as np
+from itertools import islice
+from datetime import datetime, timedelta
+from sochi.data.db.base.dbConfig import DBConfiguration
+from sochi.data.db.base.TweetsDB import tweet_row_type, TWEET_READ_COLUMNS, STREAM_CHUNK_SIZE
+from sochi.data.db.sochi.settings_db import *
+from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
+from sochi.data.sochi.constants import *
+from sochi.utils.array_file import ArrayFileWriter, read_array_file
+
+COLUMNS_MAGIC = "TWCOLS01"
+COLUMNS_SUFFIX = ".twcol"
+
+# the columns exported, when the tweet table has them
+EXPORT_COLUMNS = ('tweet_id','created_at','from_user_id','from_user','from_user_name',
+                  'tweet_text','lat','lon','query_source')
+
+# how each column is stored, the rest are text
+INT_COLUMNS = ('tweet_id','from_user_id')
+DATE_COLUMNS = ('created_at',)
+FLOAT_COLUMNS = ('lat','lon')
+
+def str_to_datetime(date_str=None):
+    dt = None
+    try:
+        dt = datetime.strptime(date_str,"%Y-%m-%d %H:%M:%S")
+    except:
+        try:
+            dt = datetime.strptime(date_str,"%Y %m %d")
+        except:
+            dt = None
+    return dt
+
+
+##
+# Seconds since the epoch of a created_at, a datetime or a string of
+# the digits "%Y%m%d%H%M%S" (with or without separators), like the
+# date range arguments of the queries
+#
+def to_seconds(value=None):
+    if( isinstance(value,datetime) ):
+        return calendar.timegm(value.timetuple())
+    digits = "".join([c for c in str(value) if c.isdigit()])[:14]
+    return calendar.timegm(datetime.strptime(digits.ljust(14,"0"),"%Y%m%d%H%M%S").timetuple())
+
+
+def from_seconds(secs=0):
+    return datetime.utcfromtimestamp(secs)
+
+
+##
+# The week of the WEEKS calendar a day is in, None if it isn't in one
+#
+def week_of(day=None):
+    for week in range(MIN_WEEK_INDEX,MAX_WEEK_INDEX+1):
+        start_dt = str_to_datetime(WEEKS[str(week)][0])
+        end_dt = str_to_datetime(WEEKS[str(week)][1])
+        if( start_dt<=day<end_dt ):
+            return week
+    return None
+
+
+def week_days(week=0):
+    current_dt = str_to_datetime(WEEKS[str(week)][0])
+    end_dt = str_to_datetime(WEEKS[str(week)][1])
+    days = []
+    while( current_dt<end_dt ):
+        days.append(current_dt)
+        current_dt += timedelta(days=1)
+    return days
+
+
+def day_fname(dirname=None, week=0, day=None):
+    return os.path.join(dirname,"week%02d"%(week),day.strftime("%Y%m%d")+COLUMNS_SUFFIX)
+
+
+##
+# The (name, dtype) pairs of the arrays that hold columns
+#
+def column_dtypes(columns=None):
+    dtypes = []
+    for name in columns:
+        if( name in INT_COLUMNS or name in DATE_COLUMNS ):
+            dtypes.append((name,"<i8"))
+        elif( name in FLOAT_COLUMNS ):
+            dtypes.append((name,"<f8"))
+        else:
+            dtypes.append((name+".offsets","<i8"))
+            dtypes.append((name+".data","u1"))
+    return dtypes
+
+
+##
+# Turns a chunk of the rows of a query, tuples in the order of columns,
+# into a list of (name, numpy array) pairs to append to the arrays. A
+# text column gets the offset of the end of each row's value; text_ends
+# holds the bytes of each text column written so far and is updated.
+# There is no id to store for a NULL in an id column, that is an error.
+#
+def column_arrays(columns=None, rows=None, text_ends=None):
+    arrays = []
+    for i, name in enumerate(columns):
+        values = [row[i] for row in rows]
+        if( name in INT_COLUMNS ):
+            if( None in values ):
+                raise ValueError("NULL %s in the tweets to export"%(name))
+            arrays.append((name,np.array(values,dtype="<i8")))
+        elif( name in DATE_COLUMNS ):
+            arrays.append((name,np.array([to_seconds(v) for v in values],dtype="<i8")))
+        elif( name in FLOAT_COLUMNS ):
+            values = [np.nan if v is None else float(v) for v in values]
+            arrays.append((name,np.array(values,dtype="<f8")))
+        else:
+            encoded = [(v or u"").encode('utf-8') for v in values]
+            offsets = np.cumsum([len(v) for v in encoded],dtype="<i8")+text_ends.get(name,0)
+            if( len(offsets) ):
+                text_ends[name] = int(offsets[-1])
+            arrays.append((name+".offsets",offsets))
+            arrays.append((name+".data",np.frombuffer("".join(encoded),dtype=np.uint8)))
+    return arrays
+
+
+##
+# A text column of a mapped file, a value is only decoded when it is
+# used
+#
+class StringColumn(object):
+    def __init__(self, offsets=None, data=None):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i+1]].tostring().decode('utf-8')
+
+    def __iter__(self):
+        return iter(self.values())
+
+    ##
+    # The values of the rows from first to last, the bytes are copied
+    # out of the mapped file once for the whole range
+    #
+    def values(self, first=0, last=None):
+        if( last is None ):
+            last = len(self)
+        offsets = self.offsets[first:last+1].tolist()
+        if( not offsets ):
+            return []
+        base = offsets[0]
+        buf = self.data[base:offsets[-1]].tostring()
+        return [buf[offsets[i]-base:offsets[i+1]-base].decode('utf-8')
+                for i in xrange(len(offsets)-1)]
+
+
+##
+# One memory mapped columns file. The numeric columns are numpy arrays
+# that point into the mapped file, the text columns are StringColumns.
+#
+class TweetColumnsFile(object):
+    def __init__(self, fname=None):
+        self.fname = fname
+        self.header, self.arrays = read_array_file(fname=fname, magic=COLUMNS_MAGIC,
+                                                   kind="tweet columns")
+        self.count = self.header['rows']
+        self.columns = self.header['columns']
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name=None):
+        if( name in self.arrays ):
+            return self.arrays[name]
+        return StringColumn(offsets=self.arrays[name+".offsets"],
+                            data=self.arrays[name+".data"])
+
+    ##
+    # The first and last row of the created_at range [start, end), the
+    # rows are in created_at order so this is a binary search
+    #
+    def date_slice(self, start_secs=None, end_secs=None):
+        created = self.arrays['created_at']
+        first = 0
+        last = self.count
+        if( start_secs is not None ):
+            first = int(np.searchsorted(created,start_secs,side="left"))
+        if( end_secs is not None ):
+            last = int(np.searchsorted(created,end_secs,side="left"))
+        return first, max(first,last)
+
+    ##
+    # Yields the rows from first to last as the named tuples of the
+    # TweetsDB column queries, with the values converted back
+    #
+    def rows(self, columns=TWEET_READ_COLUMNS, first=0, last=None):
+        if( last is None ):
+            last = self.count
+        row_type = tweet_row_type(columns)
+        values = []
+        for name in columns:
+            col = self.column(name)
+            if( name in DATE_COLUMNS ):
+                values.append([from_seconds(v) for v in col[first:last].tolist()])
+            elif( name in FLOAT_COLUMNS ):
+                values.append([None if v!=v else v for v in col[first:last].tolist()])
+            elif( name in INT_COLUMNS ):
+                values.append(col[first:last].tolist())
+            else:
+                values.append(col.values(first,last))
+        for row in zip(*values):
+            yield row_type._make(row)
+
+    ##
+    # Drops the arrays, the mapping goes away with the last of them
+    #
+    def close(self):
+        self.arrays = {}
+
+
+##
+# The columns files of a directory, read like the database
+#
+class TweetColumnStore(object):
+    def __init__(self, dirname=None):
+        self.dirname = dirname
+
+    def day_files(self, start_dt=None, end_dt=None):
+        fnames = []
+        day = datetime(start_dt.year,start_dt.month,start_dt.day)
+        while( day<end_dt ):
+            week = week_of(day)
+            if( week is not None ):
+                fname = day_fname(self.dirname,week,day)
+                if( os.path.exists(fname) ):
+                    fnames.append(fname)
+            day += timedelta(days=1)
+        return fnames
+
+    ##
+    # Yields the tweets of a date range as named tuples of the columns,
+    # the way TweetsDB.iter_tweet_columns_by_date_range() does. Only
+    # the days of the range are mapped and the rows are found with a
+    # binary search on created_at, they are always in created_at order.
+    # The values are decoded chunk_size rows at a time.
+    #
+    def iter_tweet_columns_by_date_range(self, columns=TWEET_READ_COLUMNS, start_date=None,
+                                         end_date=None, chunk_size=STREAM_CHUNK_SIZE):
+        if( start_date is None ):
+            start_date = str_to_datetime(START_DATE)
+        if( end_date is None ):
+            end_date = str_to_datetime(END_DATE)
+        start_secs = to_seconds(start_date)
+        end_secs = to_seconds(end_date)
+        for fname in self.day_files(from_seconds(start_secs),from_seconds(end_secs)):
+            cf = TweetColumnsFile(fname)
+            first, last = cf.date_slice(start_secs,end_secs)
+            for chunk_first in xrange(first,last,chunk_size):
+                chunk_last = min(chunk_first+chunk_size,last)
+                for row in cf.rows(columns=columns,first=chunk_first,last=chunk_last):
+                    yield row
+            cf.close()
+
+    def count_tweet_table_by_date_range(self, start_date=None, end_date=None):
+        start_secs = to_seconds(start_date)
+        end_secs = to_seconds(end_date)
+        count = 0
+        for fname in self.day_files(from_seconds(start_secs),from_seconds(end_secs)):
+            first, last = TweetColumnsFile(fname).date_slice(start_secs,end_secs)
+            count += last-first
+        return count
+
+    def close(self):
+        return
+
+
+##
+# Exports one day of tweets, in created_at order, to its columns file.
+# The rows are read and written chunk_size at a time, a day is never
+# held in memory. Tweets without a tweet_id are skipped. Returns the
+# number of tweets exported and the number skipped.
+#
+def export_day(db=None, dirname=None, week=0, day=None, columns=None,
+               chunk_size=STREAM_CHUNK_SIZE):
+    start_date = day.strftime("%Y%m%d%H%M%S")
+    end_date = (day+timedelta(days=1)).strftime("%Y%m%d%H%M%S")
+    rows = db.iter_tweet_columns_by_date_range(columns=columns,
+                                               start_date=start_date,
+                                               end_date=end_date,
+                                               in_order=True,
+                                               chunk_size=chunk_size)
+    fname = day_fname(dirname,week,day)
+    if( not os.path.isdir(os.path.dirname(fname)) ):
+        os.makedirs(os.path.dirname(fname))
+    id_index = list(columns).index('tweet_id')
+    writer = ArrayFileWriter(fname=fname, magic=COLUMNS_MAGIC, arrays=column_dtypes(columns))
+    try:
+        # each text column's offsets start with the 0 of its first value
+        for name, dtype in column_dtypes(columns):
+            if( name.endswith(".offsets") ):
+                writer.append(name,[0])
+        count = 0
+        skipped = 0
+        text_ends = {}
+        chunk = list(islice(rows,chunk_size))
+        while( chunk ):
+            kept = [row for row in chunk if row[id_index] is not None]
+            skipped += len(chunk)-len(kept)
+            count += len(kept)
+            for name, arr in column_arrays(columns,kept,text_ends):
+                writer.append(name,arr)
+            chunk = list(islice(rows,chunk_size))
+    except:
+        writer.abort()
+        raise
+    finally:
+        if( hasattr(rows,'close') ):
+            rows.close()
+    header = {'rows':count,
+              'columns':list(columns),
+              'week':week,
+              'day':day.strftime("%Y%m%d")}
+    writer.close(header=header)
+    return count, skipped
+
+
+##
+# Exports the days of a range of weeks. Days that already have a file
+# are skipped unless force is set.
+#
+def export_weeks(db=None, dirname=None, weeks=None, force=False, report=False):
+    columns = [c for c in EXPORT_COLUMNS if c in db.tweet_table.c]
+    total = 0
+    for week in range(weeks[0],(weeks[1]+1)):
+        if( (week<MIN_WEEK_INDEX) or (week>MAX_WEEK_INDEX) ):
+            continue
+        for day in week_days(week):
+            if( not force and os.path.exists(day_fname(dirname,week,day)) ):
+                if( report ):
+                    print "Week %d, %s: already exported"%(week,day.strftime("%Y-%m-%d"))
+                continue
+            count, skipped = export_day(db=db, dirname=dirname, week=week, day=day,
+                                        columns=columns)
+            total += count
+            if( report ):
+                print "Week %d, %s: %d tweets"%(week,day.strftime("%Y-%m-%d"),count)
+                if( skipped ):
+                    print "    skipped %d tweets without a tweet_id"%(skipped)
+    return total
+
+
+def parse_date(dstr=None):
+    date = None
+    try:
+        date = datetime.strptime(dstr,"%Y%m%d")
+    except:
+        try:
+            date = datetime.strptime(dstr,"%d-%m-%Y")
+        except:
+            try:
+                date = datetime.strptime(dstr,"%d/%m/%Y")
+            except:
+                print "Can't parse that date."
+                date = None
+    return date
+
+
+def parse_range(r=None):
+    start = 0
+    end = 0
+    start_str = r.partition('-')[0]
+    end_str = r.partition('-')[2]
+    if( start_str ):
+        start = int(start_str)
+        end = start
+    if( end_str ):
+        end = int(end_str)
+    return [start,end]
+
+
+def parse_params(argv):
+    dirname = None     # directory of the columns files
+    export = False     # export from the database
+    week = [1,1]       # weeks to export
+    force = False      # export days that were already exported
+    dt = None          # date to read
+    dur = 1            # days to read
+    report = True      # report progress
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-dir"):
+            pc += 1
+            dirname = argv[pc]
+        if( param == "-export"):
+            export = True
+        if( param == "-week"):
+            pc += 1
+            week = parse_range(argv[pc])
+        if( param == "-all"):
+            week = [MIN_WEEK_INDEX,MAX_WEEK_INDEX]
+        if( param == "-force"):
+            force = True
+        if( param == "-date"):
+            pc += 1
+            dt = parse_date(argv[pc])
+        if( param == "-dur"):
+            pc += 1
+            dur = int(argv[pc])
+        if( param == "-report"):
+            report = True
+        if( param == "-no_report"):
+            report = False
+        pc += 1
+    return {'dir':dirname, 'export':export, 'week':week, 'force':force,
+            'date':dt, 'duration':dur, 'report':report }
+
+
+def usage(prog):
+    print "USAGE: %s -dir <dir> (-export [-week <n>-<m> | -all] [-force] | -date <date> [-dur <days>]) [-report | -no_report]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python tweet_columns.py -dir columns -export -week 3-5
+#   python tweet_columns.py -dir columns -export -all
+#   python tweet_columns.py -dir columns -date 20130101 -dur 7
+
+def main(argv):
+    if len(argv) < 4:
+        usage(sys.argv[0])
+    params = parse_params(argv)
+    if( not params['dir'] or (not params['export'] and not params['date']) ):
+        usage(sys.argv[0])
+
+    if( params['export'] ):
+        config = DBConfiguration(db_settings=DATABASE_SETTINGS['default'])
+        db = DB(config=config)
+        total = export_weeks(db=db, dirname=params['dir'], weeks=params['week'],
+                             force=params['force'], report=params['report'])
+        print "Exported %d tweets"%(total)
+        db.close()
+    else:
+        store = TweetColumnStore(params['dir'])
+        end_dt = params['date']+timedelta(days=params['duration'])
+        start = time.time()
+        count = 0
+        for tweet in store.iter_tweet_columns_by_date_range(start_date=params['date'],
+                                                            end_date=end_dt):
+            count += 1
+        print "Read %d tweets in %.3fs"%(count,time.time()-start)
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,34 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: tweet_stream.py
+#
+#   The walk over the streamed tweets of a date range query, shared by
+#   the scripts that read whole days of tweets
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+
+##
+# Walks the streamed tweets of a query. The query runs as the tweets are
+# read, so an error in it comes from the walk, not from query_date().
+# The error is reported and raised again, a failed query must not look
+# like a short day. Closing the walk closes the query's stream.
+#
+def stream_tweets(tweets=None):
+    try:
+        for tweet in tweets:
+            yield tweet
+    except Exception, e:
+        print "EXCEPTION when running query!"
+        print e
+        raise
+    finally:
+        if( hasattr(tweets,'close') ):
+            tweets.close()
+    return
+
+
+if __name__ == '__main__':
+    print "No main()"
@@ -11,17 +11,18 @@
 #   express permissions.
 #
 import sys, gc, time, string, json, pickle, random
+from itertools import islice
 from datetime import datetime, timedelta
-from infx.data.db.base.dbConfig import DBConfiguration
-from infx.data.db.fitness.settings_db import *
-from infx.data.db.fitness.FitTweetsDB import FitTweetsDB as DB
-from infx.data.db.fitness.FitTweetObj import FitTweetObj
-from infx.utils.tweet_entities import tweet_entities
-from infx.utils.stop_words import remove_stops
-from infx.data.fitness.constants import *
+from sochi.data.db.base.dbConfig import DBConfiguration
+from sochi.data.db.sochi.settings_db import *
+from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
+from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
+from sochi.utils.tweet_entities import tweet_entities
+from sochi.utils.stop_words import remove_stops
+from sochi.data.sochi.constants import *
+from sochi.data.sochi.tweet_stream import stream_tweets
 
 def query_date(db=None, date=None, dur=1, by_hour=False):
-    result_list = []
     if( by_hour ):
         delta = timedelta(hours=1)
     else:
@@ -31,15 +32,12 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
     end_date = dt2.strftime("%Y%m%d%H%M%S")
     #start_date = date.strftime("%Y%m%d000000")
     #end_date = dt2.strftime("%Y%m%d000000")
-    try:
-        result_list = db.query_tweet_table_by_date_range(start_date=start_date,
-                                                         end_date=end_date,
-                                                         in_order=True)
-    except Exception, e:
-        print "EXCEPTION when running query!"
-        print e
-        result_list = []
-    return {'tweet_list':result_list, 
+    # only the text is read, as rows
+    tweets = db.iter_tweet_columns_by_date_range(columns=('tweet_text',),
+                                                 start_date=start_date,
+                                                 end_date=end_date,
+                                                 in_order=True)
+    return {'tweets':stream_tweets(tweets), 
             'query_date':date, 
             'start_date_str':start_date, 
             'end_date_str':end_date,
@@ -50,15 +48,23 @@ def tweet_doc(db=None, start_date=None, dur=1, lines=-1, stops=False, as_list=Fa
     doc_list = []
     doc = u""
     
-    # query the database to get a set (list) of tweets
+    # query the database to get a stream of tweets
     result = query_date(db=db, date=start_date, dur=dur)
-    tweet_list = result['tweet_list']
+    tweets = result['tweets']
     
+    total_tweets = 0
     if( report ):
-        print "Found %d tweets."%(len(tweet_list))
+        # count them with the database before the stream is read, no
+        # other query can run while the stream is open
+        total_tweets = db.count_tweet_table_by_date_range(start_date=result['start_date_str'],
+                                                          end_date=result['end_date_str'])
+    
+    # if we're keeping only a few of the lines, stop reading after them
+    if( lines>0 ):
+        tweets = islice(tweets,lines)
     
-    # now iterate through the list of the tweet objects
-    for tweet in tweet_list:
+    # now iterate through the tweet objects as they are read
+    for tweet in tweets:
         # remove any newline or carriage return in each tweet
         fixed_tweet = tweet.tweet_text.replace("\n"," ").replace("\r"," ")
         # if we're supposed to remove stop words, then remove them
@@ -66,10 +72,13 @@ def tweet_doc(db=None, start_date=None, dur=1, lines=-1, stops=False, as_list=Fa
             fixed_tweet = remove_stops(fixed_tweet)
         # now add the tweet to the list
         doc_list.append(fixed_tweet)
-    
-    # if we're keeping only a few of the lines, cut the list down
-    if( lines>0 ):
-        doc_list = doc_list[0:lines]
+    # the stream is still open when only some of the lines were read
+    result['tweets'].close()
+
+    if( report ):
+        print "Found %d tweets."%(total_tweets)
+        if( lines>0 ):
+            print "Kept %d tweets."%(len(doc_list))
     
     if( as_list ):
         # just keep it as a list of individual tweets
@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: AsyncClient.py
+#
+#   Runs the requests of many twitter objects (Search, UserLookup,
+#   FriendsFollowers, UserTimeline, Trends) at the same time from one
+#   OS thread. Each object is set up with its usual methods, like
+#   set_query_terms(), add_user_id() or set_woeid(), but it is not
+#   started as a thread. The client runs its make_request() as a gevent
+#   greenlet, so a paged request with continuations stays one greenlet,
+#   and all of the objects share one http connection pool. The pages
+#   come back through one queue, with the object that asked for them.
+#
+#   gevent has to patch the standard library before requests and
+#   threading are used, so a script that uses the client starts with
+#
+#       from gevent import monkey
+#       monkey.patch_all()
+#
+#   UserLookup makes a request on its own once make_request_at users
+#   are added. Raise that with set_request_threshold() and use one
+#   object per 100 users.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+from gevent import monkey
+if( __name__ == '__main__' ):
+    # run as a script, patch before anything else is imported
+    monkey.patch_all()
+import sys, logging
+import requests
+import gevent
+from gevent.pool import Pool
+from gevent.queue import Queue
+from sochi.common.SessionPool import session_key, mount_adapter, restore_adapters
+from sochi.twitter.Login import Login
+from sochi.twitter.Search import Search
+from sochi.twitter.auth_settings import *
+
+# put on the page queue when an object's request is done
+_REQUEST_DONE = object()
+
+
+##
+# Stands in as the receiver of one object, so its pages are put on the
+# client's queue together with the object
+#
+class _PageReceiver(object):
+    def __init__(self, client=None, obj=None):
+        self.client = client
+        self.obj = obj
+
+    def put_message(self, m=None):
+        self.client.page_queue.put((self.obj,m))
+
+
+class AsyncClient(object):
+    def __init__(self, concurrency=500, pool_size=None, logger=None):
+        if( not monkey.is_module_patched("socket") ):
+            raise RuntimeError("AsyncClient needs gevent.monkey.patch_all() before requests is imported")
+        if( not pool_size ):
+            # keep a connection for every running request
+            pool_size = concurrency
+        self.logger = logger or logging.getLogger(__name__)
+        self.concurrency = concurrency
+        self.pool = Pool(size=concurrency)
+        self.page_queue = Queue()
+        self.pending = 0
+        self.errors = []
+        # one adapter, so one connection pool per host, for every session
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                     pool_maxsize=pool_size,
+                                                     max_retries=3)
+        # the SessionPool keys the adapter is mounted for, with the
+        # adapters they had before, put back by close()
+        self.mounted = {}
+
+    ##
+    # Mounts the client's adapter in the SessionPool for the host of url
+    # and the credentials, so the sessions of every greenlet for that
+    # key use the client's connection pool
+    #
+    def _mount(self, url=None, credentials=None):
+        key = session_key(url=url, credentials=credentials)
+        if( key not in self.mounted ):
+            adapters = mount_adapter(url=url, credentials=credentials, adapter=self.adapter)
+            self.mounted[key] = (url, credentials, adapters)
+
+    ##
+    # Puts the adapters the SessionPool had before back, the objects
+    # keep using the shared sessions after the client is closed
+    #
+    def _unmount(self):
+        for url, credentials, adapters in self.mounted.values():
+            restore_adapters(url=url, credentials=credentials, adapters=adapters,
+                             mounted=self.adapter)
+        self.mounted = {}
+
+    ##
+    # Starts the request of a configured object. The object keeps using
+    # the shared sessions for its host and Login credentials (see
+    # SessionPool), but they are put on the client's connection pool
+    # until the client is closed.
+    # When concurrency requests are already running this waits for one to
+    # finish. Returns the greenlet.
+    #
+    def submit(self, obj=None):
+        self.pending += 1
+        return self._spawn(obj)
+
+    def _spawn(self, obj=None):
+        self._mount(url=self._request_url(obj), credentials=self._credentials(obj))
+        obj.set_receiver(_PageReceiver(client=self, obj=obj))
+        return self.pool.spawn(self._run, obj)
+
+    ##
+    # The url an object's request goes to, from its request descriptor
+    # like _make_request() looks its session up. Objects that build the
+    # descriptor in make_request(), like Search, use their request domain.
+    #
+    def _request_url(self, obj=None):
+        request = obj.get_request_data()
+        if( request and request.get('domain') ):
+            return request['domain']
+        return obj.get_request_domain()
+
+    def _credentials(self, obj=None):
+        auth = obj.get_auth_obj()
+        if( auth ):
+            return auth.credentials()
+        return None
+
+    def _run(self, obj=None):
+        try:
+            obj.make_request()
+        except Exception, e:
+            self.logger.info("%s request failed: %s"%(obj.name,str(e)))
+            self.errors.append((obj,e))
+        finally:
+            self.page_queue.put((obj,_REQUEST_DONE))
+
+    ##
+    # Yields (object, page) pairs as the pages arrive, until every
+    # submitted request is done. A Search page is a list of tweets.
+    #
+    def pages(self):
+        while( self.pending>0 ):
+            obj, page = self.page_queue.get()
+            if( page is _REQUEST_DONE ):
+                self.pending -= 1
+            else:
+                yield obj, page
+
+    ##
+    # Submits a list of objects and yields their pages. The objects are
+    # submitted from a separate greenlet, so pages are read while the
+    # rest are still waiting for a free slot.
+    #
+    def run(self, objs=None):
+        objs = list(objs)
+        # count them all now, so pages() doesn't stop early
+        self.pending += len(objs)
+        feeder = gevent.spawn(self._spawn_all, objs)
+        for item in self.pages():
+            yield item
+        feeder.join()
+
+    def _spawn_all(self, objs=None):
+        for obj in objs:
+            self._spawn(obj)
+
+    def join(self, timeout=None):
+        self.pool.join(timeout=timeout)
+
+    def close(self):
+        self.pool.kill()
+        self._unmount()
+        self.adapter.close()
+
+
+def parse_params(argv):
+    auth = None
+    user = None
+    queries = []
+    size = 100
+    concurrency = 500
+    continuation = False
+    debug = False
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-auth"):
+            pc += 1
+            auth = argv[pc]
+        if( param == "-user"):
+            pc += 1
+            user = argv[pc]
+        if( param == "-query"):
+            pc += 1
+            queries.append(argv[pc])
+        if( param == "-file"):
+            pc += 1
+            f = open(argv[pc],"r")
+            queries.extend([line.strip() for line in f if line.strip()])
+            f.close()
+        if( param == "-page_size"):
+            pc += 1
+            size = int(argv[pc])
+        if( param == "-concurrency"):
+            pc += 1
+            concurrency = int(argv[pc])
+        if( param == "-cont"):
+            continuation = True
+        if( param == "-debug"):
+            debug = True
+        pc += 1
+    return {'auth':auth, 'user':user, 'queries':queries, 'page_size':size,
+            'concurrency':concurrency, 'use_continuations':continuation, 'debug':debug }
+
+
+def usage(argv):
+    print "USAGE: python %s -auth <appname> -user <auth_user> (-query \"<query_terms>\" | -file <queries.txt>)... [-page_size <n>] [-concurrency <n>] [-cont] [-debug]"%(argv[0])
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python AsyncClient.py -auth MyApp -user me -query "#sochi" -query "#olympics"
+#   python AsyncClient.py -auth MyApp -user me -file queries.txt -cont -concurrency 200
+
+def main(argv):
+    if len(argv) < 5:
+        usage(argv)
+    p = parse_params(argv)
+    if( not p['auth'] or not p['user'] or not p['queries'] ):
+        usage(argv)
+
+    app_keys = TWITTER_APP_OAUTH_PAIR(app=p['auth'])
+    app_token_fname = TWITTER_APP_TOKEN_FNAME(app=p['auth'])
+    lg = Login( name="AsyncClientLoginObj",
+                app_name=p['auth'],
+                app_user=p['user'],
+                token_fname=app_token_fname)
+    if( p['debug'] ):
+        lg.set_debug(True)
+    lg.set_consumer_key(consumer_key=app_keys['consumer_key'])
+    lg.set_consumer_secret(consumer_secret=app_keys['consumer_secret'])
+    lg.login()
+
+    searches = []
+    for query in p['queries']:
+        twit = Search()
+        twit.set_user_agent(agent="random")
+        twit.set_auth_obj(obj=lg)
+        twit.set_query_terms(query)
+        twit.set_query_result_type(rt="recent")
+        twit.set_page_size(sz=p['page_size'])
+        if( p['use_continuations'] ):
+            twit.set_continuation(True)
+        searches.append(twit)
+
+    client = AsyncClient(concurrency=p['concurrency'])
+    counts = {}
+    for twit, page in client.run(searches):
+        query = twit.get_query_terms()
+        counts[query] = counts.get(query,0)+len(page)
+    client.close()
+
+    for query in p['queries']:
+        print "%6d: %s"%(counts.get(query,0),query)
+    for twit, err in client.errors:
+        print "ERROR:",twit.get_query_terms(),err
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
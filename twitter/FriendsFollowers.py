@@ -100,6 +100,29 @@ class FriendsFollowers(TwitterBase):
         else:
             self.set_request_param(kw="cursor",val=None)
 
+    ##
+    # Puts one page of friends or followers on the message queue and keeps
+    # its cursors, both are 0 when there are no more pages
+    #
+    def handle_response(self, request=None, response=None):
+        self.next_cursor = 0
+        self.prev_cursor = 0
+        if( response or response.text ):
+            try:
+                js = response.json()
+                #print "IN make_request() cursor=%d"%(next_cursor)
+                #print json.dumps(js, sort_keys=True, indent=4)
+                self.put_message(m=js)
+                if( "error" not in js ):
+                    if( "next_cursor" in js ):
+                        self.next_cursor = js['next_cursor']
+                    if( "previous_cursor" in js ):
+                        self.prev_cursor = js['previous_cursor']
+            except ValueError, e:
+                mesg = "JSON ValueError: "+str(e)
+                self.logger.info(mesg)
+        return
+
     ##
     # 
     #
@@ -126,38 +149,13 @@ class FriendsFollowers(TwitterBase):
                                     method="GET",
                                     params=self.get_request_params())
                 request_results = self._make_request(request=self._request_data)
-                if( request_results or request_results.text ):
-                    try:
-                        js = request_results.json()
-                        #print "IN make_request() cursor=%d"%(next_cursor)
-                        #print json.dumps(js, sort_keys=True, indent=4)
-                        self.put_message(m=js)
-                        if( "error" in js ):
-                            self.next_cursor = 0
-                            self.prev_cursor = 0
-                        else:
-                            if( "next_cursor" in js ):
-                                self.next_cursor = js['next_cursor']
-                            else:
-                                self.next_cursor = 0
-                            if( "previous_cursor" in js ):
-                                self.prev_cursor = js['previous_cursor']
-                            else:
-                                self.prev_cursor = 0
-                        
-                        if( self.cursor_forward ):
-                            self._set_cursor(cursor=self.next_cursor)
-                            cursor_end = self.next_cursor
-                        else:
-                            self._set_cursor(cursor=self.prev_cursor)
-                            cursor_end = self.prev_cursor
-                    except ValueError, e:
-                        mesg = "JSON ValueError: "+str(e)
-                        self.logger.info(mesg)
-                        js = None
-                        cursor_end = 0
+                self.handle_response(request=self._request_data, response=request_results)
+                if( self.cursor_forward ):
+                    self._set_cursor(cursor=self.next_cursor)
+                    cursor_end = self.next_cursor
                 else:
-                    cursor_end = 0
+                    self._set_cursor(cursor=self.prev_cursor)
+                    cursor_end = self.prev_cursor
             self.querying = False
         except:
             self.querying = False
@@ -8,7 +8,7 @@
 #   Copyright by Author. All rights reserved. Not for reuse without
 #   express permissions.
 #
-import sys, time, logging
+import sys, logging
 import json
 # The native JSON decoder is "slow" - should check to see if one of these
 # alternatives is faster. Maybe explore these at some point.
@@ -172,6 +172,32 @@ class Search(TwitterBase):
         else:
             self.set_request_param(kw="result_type",val=None)
 
+    ##
+    # Puts the list of tweets from one search page on the message queue
+    #
+    def handle_response(self, request=None, response=None):
+        js = None
+        if( response or response.text ):
+            try:
+                js = response.json()
+            except ValueError, e:
+                mesg = "JSON ValueError: "+str(e)
+                self.logger.info(mesg)
+                js = None
+
+        if( js and ('statuses' in js) ):
+            results_list = []
+            #print "IN make_request()"
+            #print json.dumps(js, sort_keys=True, indent=4)
+            results_list = js['statuses']
+            # don't bother to add this if it's an empty list
+            if( len(results_list) > 0 ):
+                self.put_message(m=results_list)
+                rinfo = self.get_request_info()
+                if( rinfo ):
+                    rinfo['success']=True
+        return
+
     ##
     # 
     #
@@ -228,26 +254,7 @@ class Search(TwitterBase):
                         print json.dumps(self._request_data, sort_keys=True, indent=4)
 
                 request_results = self._make_request(request=self._request_data)
-                js = None
-                if( request_results or request_results.text ):
-                    try:
-                        js = request_results.json()
-                    except ValueError, e:
-                        mesg = "JSON ValueError: "+str(e)
-                        self.logger.info(mesg)
-                        js = None
-    
-                if( js and ('statuses' in js) ):
-                    results_list = []
-                    #print "IN make_request()"
-                    #print json.dumps(js, sort_keys=True, indent=4)
-                    results_list = js['statuses']
-                    # don't bother to add this if it's an empty list
-                    if( len(results_list) > 0 ):
-                        self.put_message(m=results_list)
-                        rinfo = self.get_request_info()
-                        if( rinfo ):
-                            rinfo['success']=True
+                self.handle_response(request=self._request_data, response=request_results)
 
                 p_stat = stat
                 if( self.continuation ):
@@ -390,7 +397,10 @@ def main(argv):
     tweet_count = 0
     mesg_count = 0
     while( twit.messages()>0 or twit.query_in_process() ):
-        m = twit.get_message()
+        # blocks until a page arrives or the query is done
+        m = twit.get_message(block=True)
+        if( m is None ):
+            continue
         mesg_count += 1
         if( m ):
             tot = tot + len(m)
@@ -405,8 +415,6 @@ def main(argv):
                     print rec['user']['screen_name'].encode('utf-8'),rec['user']['name'].encode('utf-8'),
                     print ":",rec['text'].encode('utf-8')
                     print
-        while( twit.messages()<1 and twit.query_in_process() ):
-            time.sleep(2)
     
     if( twit.had_warning() ):
         print "WARNING:",twit.get_last_warning()
@@ -56,6 +56,30 @@ class Trends(TwitterBase):
     def set_woeid(self, woeid=1):
         self.set_request_param(kw="id",val=str(woeid))
 
+    ##
+    # Puts the trends, or the available trend locations, on the message
+    # queue
+    #
+    def handle_response(self, request=None, response=None):
+        js = None
+        if( response or response.text ):
+            try:
+                js = response.json()
+            except ValueError, e:
+                mesg = "JSON ValueError: "+str(e)
+                self.logger.info(mesg)
+                js = None
+
+        if( js ):
+            #print json.dumps(js, sort_keys=True, indent=4)
+            if( self.trends_available ):
+                self.put_message(js)
+            else:
+                ## This was a trends query
+                trend_list = js[0]['trends']
+                self.put_message(trend_list)
+        return
+
     ##
     # 
     #
@@ -70,24 +94,7 @@ class Trends(TwitterBase):
                                 method="GET",
                                 params=self.get_request_params())
             request_results = self._make_request(request=self._request_data)
-            
-            js = None
-            if( request_results or request_results.text ):
-                try:
-                    js = request_results.json()
-                except ValueError, e:
-                    mesg = "JSON ValueError: "+str(e)
-                    self.logger.info(mesg)
-                    js = None
-
-            if( js ):
-                #print json.dumps(js, sort_keys=True, indent=4)
-                if( self.trends_available ):
-                    self.put_message(js)
-                else:
-                    ## This was a trends query
-                    trend_list = js[0]['trends']
-                    self.put_message(trend_list)
+            self.handle_response(request=self._request_data, response=request_results)
             self.querying = False
         except:
             self.querying = False
@@ -143,6 +143,23 @@ class UserLookup(TwitterBase):
         self.usem.release()
         return [uidStr,count]
 
+    ##
+    # Puts the user objects from one lookup on the message queue
+    #
+    def handle_response(self, request=None, response=None):
+        js = None
+        if( response or response.text ):
+            try:
+                js = response.json()
+            except ValueError, e:
+                mesg = "JSON ValueError: "+str(e)
+                self.logger.info(mesg)
+                js = None
+        if( js ):
+            #print json.dumps(js, sort_keys=True, indent=4)
+            self.put_message(m=js)
+        return
+
     ##
     # 
     #
@@ -181,17 +198,7 @@ class UserLookup(TwitterBase):
                                 params=self.get_request_params())
             
             request_results = self._make_request(request=self._request_data)
-            js = None
-            if( request_results or request_results.text ):
-                try:
-                    js = request_results.json()
-                except ValueError, e:
-                    mesg = "JSON ValueError: "+str(e)
-                    self.logger.info(mesg)
-                    js = None
-            if( js ):
-                #print json.dumps(js, sort_keys=True, indent=4)
-                self.put_message(m=js)
+            self.handle_response(request=self._request_data, response=request_results)
             self.querying = False
         except:
             self.querying = False
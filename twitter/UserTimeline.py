@@ -11,7 +11,7 @@
 #   Copyright by Author. All rights reserved. Not for reuse without
 #   express permissions.
 #
-import sys, time, json, logging
+import sys, json, logging
 from sochi.twitter.Login import Login
 from sochi.twitter.TwitterBase import TwitterBase
 from sochi.twitter.auth_settings import *
@@ -125,6 +125,31 @@ class UserTimeline(TwitterBase):
             else:
                 self.set_request_param(kw="exclude_replies",val=None)
 
+    ##
+    # Puts the list of tweets from one timeline page on the message queue
+    #
+    def handle_response(self, request=None, response=None):
+        js = None
+        if( response or response.text ):
+            try:
+                js = response.json()
+            except ValueError, e:
+                mesg = "JSON ValueError: "+str(e)
+                self.logger.info(mesg)
+                js = None
+            
+        # this should come back as just a list of tweets
+        if( js and (type(js) == list) ):
+            #print "IN make_request()"
+            #print json.dumps(js, sort_keys=True, indent=4)
+            # don't bother to add this if it's an empty list
+            if( len(js) > 0 ):
+                self.put_message(m=js)
+                rinfo = self.get_request_info()
+                if( rinfo ):
+                    rinfo['success']=True
+        return
+
     ##
     # 
     #
@@ -148,25 +173,7 @@ class UserTimeline(TwitterBase):
                 print json.dumps(self._request_data, sort_keys=True, indent=4)
 
             request_results = self._make_request(request=self._request_data)
-            js = None
-            if( request_results or request_results.text ):
-                try:
-                    js = request_results.json()
-                except ValueError, e:
-                    mesg = "JSON ValueError: "+str(e)
-                    self.logger.info(mesg)
-                    js = None
-                
-            # this should come back as just a list of tweets
-            if( js and (type(js) == list) ):
-                #print "IN make_request()"
-                #print json.dumps(js, sort_keys=True, indent=4)
-                # don't bother to add this if it's an empty list
-                if( len(js) > 0 ):
-                    self.put_message(m=js)
-                    rinfo = self.get_request_info()
-                    if( rinfo ):
-                        rinfo['success']=True
+            self.handle_response(request=self._request_data, response=request_results)
 
             self.querying = False
         except:
@@ -320,9 +327,7 @@ def main(argv):
 
     m = None
     while( twit.messages()>0 or twit.query_in_process() ):
-        if( twit.messages()==0 ):
-            time.sleep(2)
-        m = twit.get_message()
+        m = twit.get_message(block=True)
         if( m ):
             #print json.dumps(m, indent=4, sort_keys=True)
             if( type(m)==dict ):
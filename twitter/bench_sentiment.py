@@ -0,0 +1,286 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: bench_sentiment.py
+#   DATE: October, 2026
+#
+#   Benchmark of the sentiment feature extraction, compares the old
+#   dense feature dictionary with the vocabulary indexed sparse features
+#   on the labeled training data and on a synthetic tweet corpus. With
+#   -check the NumPy engine is compared against the NLTK classifier and
+#   with -hash the hashed feature space is compared against the exact
+#   vocabulary for model size and accuracy.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, sys, time, random
+from sochi.twitter.explore_sentiment import Sentiment
+
+TRAINING_FNAME = os.path.join(os.path.dirname(os.path.abspath(__file__)),"training.csv")
+
+
+##
+# The original feature extraction, one dictionary entry for every
+# token that was seen in the training data
+#
+def dense_features(token_list=None, doc=None):
+    feature_dict = {}
+    for tok in token_list:
+        feature_dict[tok] = (tok in doc)
+    return feature_dict
+
+
+##
+# Generates a synthetic corpus of tweets as token lists. Token
+# frequency is roughly Zipfian, like hashtags and words in real tweets.
+#
+def synthetic_corpus(tweets=1000000, vocab_size=50000, min_len=6, max_len=18, seed=547):
+    rnd = random.Random(seed)
+    words = ["w%05d"%(i) for i in range(vocab_size)]
+    corpus = []
+    for i in xrange(tweets):
+        doc = []
+        for j in xrange(rnd.randint(min_len,max_len)):
+            idx = int(rnd.paretovariate(0.8))-1
+            doc.append(words[idx%vocab_size])
+        corpus.append(doc)
+    return corpus
+
+
+def time_features(func=None, docs=None):
+    start = time.time()
+    for doc in docs:
+        func(doc)
+    return time.time()-start
+
+
+def report(name=None, docs=0, secs=0.0):
+    if( docs ):
+        per_doc = (secs/float(docs))*1000000.0
+    else:
+        per_doc = 0.0
+    print "  %-34s %9d docs %10.3fs %12.1f us/doc"%(name,docs,secs,per_doc)
+
+
+def bench_training(fname=None):
+    s = Sentiment()
+    result = s.load_csv_label_data(fname=fname)
+    docs = [tup[0] for tup in result[0]]
+    # the old path walked every token occurrence of the training data
+    token_list = [tok for doc in docs for tok in doc]
+    start = time.time()
+    vocab_len = s.build_vocabulary(token_list)
+    build_secs = time.time()-start
+    print "training.csv: %d docs, %d tokens, %d unique"%(len(docs),len(token_list),vocab_len)
+    print "  %-34s %25.3fs"%("build vocabulary",build_secs)
+    secs = time_features(lambda doc: dense_features(token_list,doc), docs)
+    report("old dense features",len(docs),secs)
+    secs = time_features(s.features, docs)
+    report("new sparse features",len(docs),secs)
+    return
+
+
+def bench_synthetic(tweets=1000000, old_sample=5):
+    print "Generating synthetic corpus of %d tweets"%(tweets)
+    docs = synthetic_corpus(tweets=tweets)
+    token_list = [tok for doc in docs for tok in doc]
+    s = Sentiment()
+    start = time.time()
+    vocab_len = s.build_vocabulary(token_list)
+    build_secs = time.time()-start
+    print "synthetic: %d docs, %d tokens, %d unique"%(len(docs),len(token_list),vocab_len)
+    print "  %-34s %25.3fs"%("build vocabulary",build_secs)
+    # the old path is O(total tokens) per doc, so only time a small sample
+    sample = docs[:old_sample]
+    secs = time_features(lambda doc: dense_features(token_list,doc), sample)
+    report("old dense features (sample)",len(sample),secs)
+    if( sample ):
+        print "  %-34s %9d docs %10.1fs (estimated)"%("old dense features (all)",len(docs),
+                                                   (secs/len(sample))*len(docs))
+    secs = time_features(s.features, docs)
+    report("new sparse features",len(docs),secs)
+    return
+
+
+##
+# Trains the NLTK Naive Bayes classifier the original way, with the
+# dense feature dictionaries, and checks the NumPy engine gives the
+# same labels. Also times the scoring of both.
+#
+def check_nltk(fname=None):
+    import nltk
+    s = Sentiment()
+    result = s.load_csv_label_data(fname=fname)
+    label_data = result[0]
+    start = time.time()
+    s.new_classifier(label_data=label_data)
+    engine_train_secs = time.time()-start
+    token_list = [tok for doc,label in label_data for tok in doc]
+    start = time.time()
+    train_set = nltk.classify.apply_features(lambda doc: dense_features(token_list,doc),label_data)
+    nb = nltk.NaiveBayesClassifier.train(train_set)
+    nltk_train_secs = time.time()-start
+    docs = [tup[0] for tup in label_data]
+    print "NLTK check on %s: %d docs"%(os.path.basename(fname),len(docs))
+    print "  %-34s %25.3fs"%("nltk train",nltk_train_secs)
+    print "  %-34s %25.3fs"%("numpy engine train",engine_train_secs)
+    start = time.time()
+    nltk_labels = [nb.classify(dense_features(token_list,doc)) for doc in docs]
+    report("nltk classify",len(docs),time.time()-start)
+    start = time.time()
+    engine_labels = s.classifier.classify_many([s.features(doc) for doc in docs])
+    report("numpy engine classify_many",len(docs),time.time()-start)
+    same = len([1 for a,b in zip(nltk_labels,engine_labels) if a==b])
+    print "  identical labels: %d of %d"%(same,len(docs))
+    return (same==len(docs))
+
+
+##
+# A synthetic labeled corpus, a (token_list, label) pair per tweet. Most
+# tokens come from a large shared vocabulary, some come from a smaller
+# set of words that lean toward one label.
+#
+def synthetic_label_data(tweets=200000, vocab_size=200000, sentiment_words=500, seed=547):
+    rnd = random.Random(seed)
+    label_data = []
+    for i in xrange(tweets):
+        if( rnd.random()<0.5 ):
+            label, lean, other = "positive", "p", "n"
+        else:
+            label, lean, other = "negative", "n", "p"
+        doc = []
+        for j in xrange(rnd.randint(6,18)):
+            r = rnd.random()
+            if( r<0.15 ):
+                doc.append(u"%s%03d"%(lean,rnd.randint(0,sentiment_words-1)))
+            elif( r<0.20 ):
+                doc.append(u"%s%03d"%(other,rnd.randint(0,sentiment_words-1)))
+            else:
+                idx = int(rnd.paretovariate(0.8))-1
+                doc.append(u"w%06d"%(idx%vocab_size))
+        label_data.append((doc,label))
+    return label_data
+
+
+##
+# Approximate bytes held by a trained model, the engine arrays plus the
+# vocabulary index and token strings
+#
+def model_bytes(s=None):
+    header, arrays = s.classifier.model_arrays()
+    total = sum([arr.nbytes for name,arr in arrays])
+    total += sys.getsizeof(s.vocabulary)+sys.getsizeof(s.feature_names)
+    total += sys.getsizeof(s.token_counts)
+    total += sum([sys.getsizeof(tok) for tok in s.feature_names])
+    return total
+
+
+def accuracy(s=None, label_data=None):
+    labels = s.classifier.classify_many([s.features(doc) for doc,label in label_data])
+    same = len([1 for a,(doc,label) in zip(labels,label_data) if a==label])
+    return float(same)/max(len(label_data),1)
+
+
+def bench_one_space(name=None, hash_bits=0, train=None, test=None):
+    s = Sentiment(hash_bits=hash_bits)
+    start = time.time()
+    s.new_classifier(label_data=train)
+    train_secs = time.time()-start
+    start = time.time()
+    acc = accuracy(s,test)
+    score_secs = time.time()-start
+    per_doc = (score_secs/max(len(test),1))*1000000.0
+    print "  %-18s %10d features %9.1f MB %7.2fs train %8.1f us/doc %7.2f%% accuracy"%(
+            name,s.n_features(),model_bytes(s)/1048576.0,train_secs,per_doc,acc*100.0)
+    return
+
+
+##
+# Compares the exact vocabulary with several hashed feature spaces.
+# training.csv is too small to say much, so it is 5-fold cross
+# validated, the synthetic corpus is an 80/20 split.
+#
+def bench_hashing(fname=None, tweets=200000, bits_list=(10,14,18,20)):
+    s = Sentiment()
+    label_data = s.load_csv_label_data(fname=fname)[0]
+    print "Hashing on %s, 5 fold cross validation"%(os.path.basename(fname))
+    for bits in [0]+list(bits_list):
+        acc = 0.0
+        for k in range(5):
+            train = [item for i,item in enumerate(label_data) if i%5!=k]
+            test = [item for i,item in enumerate(label_data) if i%5==k]
+            fold = Sentiment(hash_bits=bits)
+            fold.new_classifier(label_data=train)
+            acc += accuracy(fold,test)/5.0
+        if( bits ):
+            name = "hashed 2**%d"%(bits)
+        else:
+            name = "exact vocabulary"
+        print "  %-18s %7.2f%% accuracy"%(name,acc*100.0)
+    if( tweets>0 ):
+        print "Hashing on a synthetic corpus of %d labeled tweets"%(tweets)
+        label_data = synthetic_label_data(tweets=tweets)
+        cut = int(len(label_data)*0.8)
+        bench_one_space("exact vocabulary",0,label_data[:cut],label_data[cut:])
+        for bits in bits_list:
+            bench_one_space("hashed 2**%d"%(bits),bits,label_data[:cut],label_data[cut:])
+    return
+
+
+def parse_params(argv):
+    fname = TRAINING_FNAME
+    tweets = 1000000
+    old_sample = 5
+    check = False
+    hashing = False
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-train"):
+            pc += 1
+            fname = argv[pc]
+        if( param == "-tweets"):
+            pc += 1
+            tweets = int(argv[pc])
+        if( param == "-old_sample"):
+            pc += 1
+            old_sample = int(argv[pc])
+        if( param == "-check"):
+            check = True
+        if( param == "-hash"):
+            hashing = True
+        pc += 1
+    return {'train':fname, 'tweets':tweets, 'old_sample':old_sample, 'check':check,
+            'hash':hashing }
+
+
+def usage(prog):
+    print "USAGE: %s [-train <labeled.csv>] [-tweets <n>] [-old_sample <n>] [-check] [-hash]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python bench_sentiment.py
+#   python bench_sentiment.py -tweets 100000 -old_sample 20
+#   python bench_sentiment.py -tweets 0 -check
+#   python bench_sentiment.py -tweets 200000 -hash
+
+def main(argv):
+    if( "-h" in argv or "-help" in argv ):
+        usage(argv[0])
+    params = parse_params(argv)
+    if( params['hash'] ):
+        bench_hashing(fname=params['train'],tweets=params['tweets'])
+        return
+    bench_training(fname=params['train'])
+    if( params['check'] ):
+        check_nltk(fname=params['train'])
+    if( params['tweets']>0 ):
+        bench_synthetic(tweets=params['tweets'],old_sample=params['old_sample'])
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
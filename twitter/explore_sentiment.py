@@ -8,79 +8,526 @@
 #   Copyright by Author. All rights reserved. Not for reuse without
 #   express permissions.
 #
-import sys, csv, nltk
-from sochi.utils.stop_words import remove_stops, STOPLIST
+import os, sys, csv, math, tempfile, zlib
+import numpy as np
+from multiprocessing import Pool, cpu_count
+from sochi.utils.tokenizer import tokenize, tokenize_batch
+from sochi.utils.array_file import write_array_file, read_array_file
 from sochi.data.db.base.dbConfig import DBConfiguration
 from sochi.data.db.sochi.settings_db import *
 from sochi.data.db.sochi.ExampleTweetsDB import ExampleTweetsDB as DB
 from sochi.data.db.sochi.ExampleTweetObj import ExampleTweetObj
 from sochi.data.sochi.constants import *
 from datetime import datetime, timedelta
+from itertools import izip
 
 
+# The saved model file is an array file of utils/array_file.py, the
+# arrays are used in place from a read-only mmap and every process that
+# loads the model shares the same physical pages.
+MODEL_MAGIC = "SNTMODL1"
+
+
+##
+# Writes a model file, the header is a dictionary that can be stored
+# as JSON and the arrays are a list of (name, numpy array) pairs
+#
+def write_model_file(fname=None, header=None, arrays=None):
+    write_array_file(fname=fname, magic=MODEL_MAGIC, header=header, arrays=arrays)
+    return
+
+
+##
+# Maps a model file into memory and returns the header and a dictionary
+# of read-only arrays that point into the mapped file
+#
+def read_model_file(fname=None):
+    return read_array_file(fname=fname, magic=MODEL_MAGIC, kind="sentiment model")
+
+
+##
+# A Naive Bayes engine over sparse feature id sets. Counts, log-priors
+# and per-feature log-likelihoods are kept in NumPy arrays indexed by
+# [label, feature id]. A batch of documents is scored as one sparse
+# matrix (documents x features) times dense weight matrix product.
+#
+# The "bernoulli" model uses the same expected likelihood estimate as
+# the nltk.NaiveBayesClassifier trained on the full True/False feature
+# dictionary, so it gives the same labels. The absent features are
+# folded into a per-label bias so scoring only touches present features.
+# The "multinomial" model scores only the features that are present.
+#
+class NaiveBayesEngine(object):
+    def __init__(self, model="bernoulli", alpha=0.5):
+        self.model = model
+        self.alpha = alpha          # smoothing, 0.5 is nltk's ELE estimate
+        self.labels = []
+        self.feature_names = []
+        self.n_features = 0         # features in use, the count arrays can be larger
+        self.label_counts = None    # documents per label
+        self.feature_counts = None  # documents per [label, feature]
+        self.log_prior = None
+        self.log_present = None     # log P(feature present | label)
+        self.log_absent = None      # log P(feature absent | label)
+        self.weights = None         # [feature, label] score per present feature
+        self.bias = None            # [label] score with no features present
+        self.stale = True           # the counts changed since compile()
+
+    ##
+    # Counts the training data, a list of (feature_id_set, label) pairs
+    #
+    def train(self, label_data=None, n_features=0, feature_names=None):
+        self.labels = []
+        self.n_features = 0
+        self.label_counts = None
+        self.feature_counts = None
+        if( feature_names is not None ):
+            self.feature_names = feature_names
+        self.add_counts(label_data=label_data, n_features=n_features)
+        self.compile()
+        return self
+
+    ##
+    # Adds a batch of (feature_id_set, label) pairs to the counts. The
+    # cost is in the size of the batch, the count arrays grow by doubling
+    # when new features or labels show up. compile() must be called
+    # before the new counts are used for scoring.
+    #
+    def add_counts(self, label_data=None, n_features=0):
+        labels = set([label for fset,label in label_data])
+        n_features = max(n_features, self.n_features)
+        if( (self.feature_counts is None) or 
+            (not labels.issubset(self.labels)) or
+            (n_features>self.feature_counts.shape[1]) or
+            (not self.feature_counts.flags.writeable) ):
+            self._resize(labels=sorted(labels.union(self.labels)), n_features=n_features)
+        self.n_features = n_features
+        label_index = dict([(label,i) for i,label in enumerate(self.labels)])
+        indptr, indices = self.sparse_batch([fset for fset,label in label_data])
+        y = np.array([label_index[label] for fset,label in label_data], dtype=np.int64)
+        np.add.at(self.label_counts, y, 1.0)
+        np.add.at(self.feature_counts, (np.repeat(y, np.diff(indptr)),indices), 1.0)
+        self.stale = True
+        return
+
+    def _resize(self, labels=None, n_features=0):
+        capacity = max(n_features, 1)
+        if( self.feature_counts is not None ):
+            capacity = max(self.feature_counts.shape[1], capacity)
+            if( n_features>capacity ):
+                capacity = max(n_features, 2*capacity)
+        label_counts = np.zeros(len(labels))
+        feature_counts = np.zeros((len(labels),capacity))
+        if( self.feature_counts is not None ):
+            rows = [labels.index(label) for label in self.labels]
+            old_capacity = self.feature_counts.shape[1]
+            label_counts[rows] = self.label_counts
+            feature_counts[rows,:old_capacity] = self.feature_counts
+        self.labels = labels
+        self.label_counts = label_counts
+        self.feature_counts = feature_counts
+        return
+
+    ##
+    # Turns the counts into log probabilities and the scoring weights
+    #
+    def compile(self):
+        alpha = self.alpha
+        n_labels = len(self.labels)
+        n_docs = self.label_counts.sum()
+        feature_counts = self.feature_counts[:,:self.n_features]
+        self.log_prior = np.log((self.label_counts+alpha)/(n_docs+alpha*n_labels))
+        label_docs = self.label_counts[:,np.newaxis]
+        # a feature (hash bucket) that never showed up in training is
+        # unknown, it gets no weight, just like a token not in the vocabulary
+        df = feature_counts.sum(axis=0)
+        unseen = (df==0)
+        if( self.model=="multinomial" ):
+            totals = feature_counts.sum(axis=1)[:,np.newaxis]
+            n_seen = self.n_features-unseen.sum()
+            self.log_present = np.log((feature_counts+alpha)/(totals+alpha*n_seen))
+            self.log_present[:,unseen] = 0.0
+            self.log_absent = None
+            self.weights = np.ascontiguousarray(self.log_present.T)
+            self.bias = self.log_prior.copy()
+        else:
+            # nltk only counts a feature value it has seen, a feature that is
+            # present in every training document never had the value False
+            bins = np.where(df<n_docs, 2.0, 1.0)
+            denom = label_docs+alpha*bins
+            self.log_present = np.log((feature_counts+alpha)/denom)
+            self.log_absent = np.log((label_docs-feature_counts+alpha)/denom)
+            self.log_present[:,unseen] = 0.0
+            self.log_absent[:,unseen] = 0.0
+            self.weights = np.ascontiguousarray((self.log_present-self.log_absent).T)
+            self.bias = self.log_prior+self.log_absent.sum(axis=1)
+        self.stale = False
+        return
+
+    ##
+    # Returns the header values and the list of (name, array) pairs
+    # that are needed to save this engine
+    #
+    def model_arrays(self):
+        if( self.stale ):
+            self.compile()
+        header = {'model':self.model,
+                  'alpha':self.alpha,
+                  'labels':list(self.labels)}
+        arrays = [('label_counts',self.label_counts),
+                  ('feature_counts',self.feature_counts[:,:self.n_features]),
+                  ('log_prior',self.log_prior),
+                  ('log_present',self.log_present),
+                  ('weights',self.weights),
+                  ('bias',self.bias)]
+        if( self.log_absent is not None ):
+            arrays.append(('log_absent',self.log_absent))
+        return header, arrays
+
+    ##
+    # Sets up this engine from a saved header and arrays, the arrays are
+    # used as they are, they are not copied
+    #
+    def load_arrays(self, header=None, arrays=None):
+        self.model = header['model']
+        self.alpha = header['alpha']
+        self.labels = [str(label) for label in header['labels']]
+        self.label_counts = arrays['label_counts']
+        self.feature_counts = arrays['feature_counts']
+        self.n_features = self.feature_counts.shape[1]
+        self.log_prior = arrays['log_prior']
+        self.log_present = arrays['log_present']
+        self.log_absent = arrays.get('log_absent')
+        self.weights = arrays['weights']
+        self.bias = arrays['bias']
+        self.stale = False
+        return
+
+    ##
+    # Packs a list of feature id sets as the row pointers and column
+    # indices of a compressed sparse row matrix
+    #
+    def sparse_batch(self, feature_sets=None):
+        lengths = [len(fset) for fset in feature_sets]
+        indptr = np.zeros(len(lengths)+1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.fromiter((fid for fset in feature_sets for fid in fset),
+                              dtype=np.int64, count=indptr[-1])
+        return indptr, indices
+
+    ##
+    # Returns the [document, label] log score matrix for a batch of
+    # feature id sets
+    #
+    def batch_scores(self, feature_sets=None):
+        if( self.stale ):
+            self.compile()
+        indptr, indices = self.sparse_batch(feature_sets)
+        # sparse rows times the weight matrix, as a difference of
+        # running sums so that documents with no features work
+        running = np.zeros((len(indices)+1,len(self.labels)))
+        np.cumsum(self.weights[indices], axis=0, out=running[1:])
+        return self.bias+(running[indptr[1:]]-running[indptr[:-1]])
+
+    ##
+    # Labels for a batch of feature id sets
+    #
+    def classify_many(self, feature_sets=None):
+        scores = self.batch_scores(feature_sets)
+        return [self.labels[i] for i in scores.argmax(axis=1)]
+
+    ##
+    # Returns the labels and the probability of each label for a batch
+    #
+    def prob_classify_many(self, feature_sets=None):
+        scores = self.batch_scores(feature_sets)
+        best = scores.argmax(axis=1)
+        scores = np.exp(scores-scores.max(axis=1)[:,np.newaxis])
+        probs = scores/scores.sum(axis=1)[:,np.newaxis]
+        return [self.labels[i] for i in best], probs
+
+    def classify(self, feature_set=None):
+        return self.classify_many([feature_set])[0]
+
+    ##
+    # The features with the largest ratio between the most likely and
+    # least likely label, in the same form as nltk's version
+    #
+    def most_informative_features(self, n=100):
+        if( self.stale ):
+            self.compile()
+        tables = [(True,self.log_present)]
+        if( self.log_absent is not None ):
+            tables.append((False,self.log_absent))
+        result = []
+        for value, table in tables:
+            hi = table.argmax(axis=0)
+            lo = table.argmin(axis=0)
+            ratio = table.max(axis=0)-table.min(axis=0)
+            for fid in np.argsort(-ratio, kind="mergesort")[:n]:
+                result.append((ratio[fid],self.feature_name(fid),value,
+                               self.labels[hi[fid]],self.labels[lo[fid]]))
+        result.sort(key=lambda x: -x[0])
+        return result[:n]
+
+    ##
+    # The token for a feature id, hashed features have no token so the
+    # bucket number is used
+    #
+    def feature_name(self, fid=0):
+        if( fid<len(self.feature_names) ):
+            return self.feature_names[fid]
+        return "<bucket %d>"%(fid)
+
+    def show_most_informative_features(self, n=10):
+        print "Most Informative Features"
+        for ratio, name, value, hi, lo in self.most_informative_features(n):
+            print "%24s = %-14r %6s : %-6s = %8.1f : 1.0"%(name,value,hi[:6],lo[:6],math.exp(ratio))
+        return
+
+
+# The labels in the CSV files and the classifier label they stand for,
+# anything else is neutral or not labeled
+CSV_LABELS = {'+':"positive", 'pos':"positive", 'positive':"positive",
+              '-':"negative", 'neg':"negative", 'negative':"negative"}
+
 
 class Sentiment(object):
-    def __init__(self):
-        self.complete_token_list = []
-        self.training_data = None
+    def __init__(self, hash_bits=0):
+        self.token_counts = {}     # token -> occurrences in the training data
+        self.vocabulary = {}       # token -> integer feature id
+        self.feature_names = []    # integer feature id -> token
+        self.hash_bits = 0         # when set, hash tokens into 2**hash_bits features
+        self.hash_mask = 0
+        self.load_stats = {}
         self.classifier = None
+        self.set_hash_bits(hash_bits)
+    
+    ##
+    # Switches to a hashed feature space. Each token is hashed into one
+    # of 2**bits buckets instead of getting a vocabulary id, so the model
+    # size and scoring cost stay fixed no matter how many distinct tokens
+    # the training data has. Zero uses the exact vocabulary.
+    #
+    def set_hash_bits(self, bits=0):
+        self.hash_bits = bits
+        self.hash_mask = (1<<bits)-1
+    
+    ##
+    # The number of features the classifier sees
+    #
+    def n_features(self):
+        if( self.hash_bits ):
+            return 1<<self.hash_bits
+        return len(self.feature_names)
+    
+    ##
+    # Streams a labeled CSV file, yields a (token_list, label) pair for
+    # each positive or negative row. Neutral and unlabeled rows are
+    # skipped. Nothing is kept, the counts of the rows are in load_stats.
+    #
+    def iter_csv_label_data(self, fname=""):
+        stats = {'lines':0, 'positive':0, 'negative':0, 'unknown':0}
+        self.load_stats = stats
+        f = open(fname,"r")
+        try:
+            reader = csv.DictReader(f,dialect="excel")
+            for rec in reader:
+                stats['lines'] += 1
+                label = CSV_LABELS.get(rec['label'])
+                if( not label ):
+                    # this one is neutral or not labeled
+                    stats['unknown'] += 1
+                    continue
+                stats[label] += 1
+                tweet_text = (rec['tweet_text'] or "").decode('utf-8')
+                yield (self.tokenize(tweet_text),label)
+        finally:
+            f.close()
     
     # Load a CSV file
     def load_csv_label_data(self,fname=""):
         label_data = []
+        self.load_stats = {'lines':0, 'positive':0, 'negative':0, 'unknown':0}
         if( fname ):
-            lines = 0
-            pos_examples = 0
-            neg_examples = 0
-            unknown = 0
-            f = open(fname,"r")
-            reader = csv.DictReader(f,dialect="excel")
-            rec = reader.next()
-            while rec:
-                lines += 1
-                tweet_text = rec["tweet_text"].decode('utf-8')
-                clean_tweet = remove_stops(tweet_text)
-                token_list = clean_tweet.split()
-                if( (rec['label']=="+") or (rec['label']=="pos") or (rec['label']=="positive") ):
-                    #tup = tuple(token_list,"positive")
-                    tup = (token_list,"positive")
-                    self.complete_token_list.extend(token_list)
-                    pos_examples += 1
-                elif( (rec['label']=="-") or (rec['label']=="neg") or (rec['label']=="negative") ):
-                    #tup = tuple(token_list,"negative")
-                    tup = (token_list,"negative")
-                    self.complete_token_list.extend(token_list)
-                    neg_examples += 1
-                else:
-                    # this one is neutral or not labeled
-                    unknown += 1
-                label_data.append(tup)
-                try:
-                    rec = reader.next()
-                except:
-                    rec = None
-            f.close()
-        return [label_data,lines,pos_examples,neg_examples,unknown]
+            label_data = list(self.iter_csv_label_data(fname))
+        stats = self.load_stats
+        return [label_data,stats['lines'],stats['positive'],stats['negative'],stats['unknown']]
     
+    ##
+    # Splits a tweet into the same tokens that the training data uses
+    #
+    def tokenize(self, text=None):
+        return tokenize(text)
     
-    def features(self, doc):
-        feature_dict = {}
-        for tok in self.complete_token_list:
-            feature_dict[tok] = (tok in doc)
-        return feature_dict
+    ##
+    # Compiles a token list into a vocabulary index, each unique token
+    # gets an integer feature id. This replaces the current vocabulary.
+    #
+    def build_vocabulary(self, token_list=None):
+        self.vocabulary = {}
+        self.feature_names = []
+        self.add_to_vocabulary(token_list)
+        return len(self.feature_names)
+    
+    ##
+    # Adds the tokens to the vocabulary index and to the token counts,
+    # new tokens get the next feature id
+    #
+    def add_to_vocabulary(self, token_list=None):
+        vocabulary = self.vocabulary
+        feature_names = self.feature_names
+        token_counts = self.token_counts
+        for tok in token_list:
+            if( tok not in vocabulary ):
+                vocabulary[tok] = len(feature_names)
+                feature_names.append(tok)
+            token_counts[tok] = token_counts.get(tok,0)+1
+        return
     
+    ##
+    # Returns the sparse feature set for a document, the set of feature
+    # ids of the vocabulary tokens that appear in the document. The doc
+    # can be a list of tokens or the raw tweet text. Cost scales with the
+    # length of the document, not the size of the vocabulary.
+    #
+    def features(self, doc):
+        if( isinstance(doc, basestring) ):
+            doc = self.tokenize(doc)
+        if( self.hash_bits ):
+            # crc32 is stable across processes and runs, unlike hash()
+            mask = self.hash_mask
+            return frozenset([zlib.crc32(tok.encode('utf-8'))&mask for tok in doc])
+        vocabulary = self.vocabulary
+        return frozenset([vocabulary[tok] for tok in doc if tok in vocabulary])
     
-    def new_classifier(self, label_data=None):
-        self.training_data = nltk.classify.apply_features(self.features,label_data)
-        #self.classifier = nltk.classify.naivebayes.NaiveBayesClassifier.train(self.training_data)
-        self.classifier = nltk.NaiveBayesClassifier.train(self.training_data)
+    ##
+    # Trains a new classifier. The label data can be a list or any
+    # iterable of (token_list, label) pairs, like iter_csv_label_data(),
+    # it is read in batches and only the counts are kept.
+    #
+    def new_classifier(self, label_data=None, model="bernoulli", batch_size=10000):
+        self.token_counts = {}
+        self.build_vocabulary([])
+        self.classifier = NaiveBayesEngine(model=model)
+        self.classifier.feature_names = self.feature_names
+        self.update(label_data=label_data, batch_size=batch_size)
+        if( self.classifier.label_counts is None ):
+            raise ValueError("no labeled examples")
+        self.classifier.compile()
         return 
     
+    ##
+    # Folds more labeled examples into the current classifier without
+    # retraining. The examples are (token_list, label) or (tweet_text,
+    # label) pairs, the labels can be any of the CSV label forms. Like
+    # iter_csv_label_data(), neutral and unlabeled examples are skipped.
+    # The cost is in the number of new examples, the log probabilities
+    # are recomputed the next time the classifier scores.
+    #
+    def update(self, label_data=None, batch_size=10000):
+        if( not self.classifier ):
+            self.classifier = NaiveBayesEngine()
+            self.classifier.feature_names = self.feature_names
+        batch = []
+        for doc, label in label_data:
+            label = CSV_LABELS.get(label)
+            if( not label ):
+                # this one is neutral or not labeled
+                continue
+            if( isinstance(doc, basestring) ):
+                doc = self.tokenize(doc)
+            batch.append((doc,label))
+            if( len(batch)>=batch_size ):
+                self._count_batch(batch)
+                batch = []
+        if( batch ):
+            self._count_batch(batch)
+        return
+    
+    def _count_batch(self, label_data=None):
+        if( not self.hash_bits ):
+            for tokens, label in label_data:
+                self.add_to_vocabulary(tokens)
+        self.classifier.add_counts([(self.features(tokens),label) for tokens,label in label_data],
+                                   n_features=self.n_features())
+        return
+    
+    ##
+    # Trains a new classifier straight from a labeled CSV file
+    #
+    def train_csv(self, fname=None, model="bernoulli", batch_size=10000):
+        self.new_classifier(label_data=self.iter_csv_label_data(fname),
+                            model=model, batch_size=batch_size)
+        return self.load_stats
+    
     def top_n_features(self, n=10):
         self.classifier.show_most_informative_features(n=n)
     
     def score(self, text):
         return self.classifier.classify(self.features(text))
+    
+    ##
+    # Scores an iterable of tweets in batches and yields a
+    # (tweet_id, label, probability) tuple for each tweet. The tweets can
+    # be tweet objects or column query rows from the DB, or
+    # (tweet_id, tweet_text) tuples. Nothing is printed.
+    #
+    def score_many(self, tweets=None, batch_size=5000):
+        batch_ids = []
+        batch_texts = []
+        for tweet in tweets:
+            # the rows of the column queries are tuples too, so look for
+            # the attributes first
+            if( hasattr(tweet,'tweet_text') ):
+                tweet_id, text = tweet.tweet_id, tweet.tweet_text
+            else:
+                tweet_id, text = tweet
+            batch_ids.append(tweet_id)
+            batch_texts.append(text)
+            if( len(batch_ids)>=batch_size ):
+                for result in self._score_batch(batch_ids, batch_texts):
+                    yield result
+                batch_ids = []
+                batch_texts = []
+        if( batch_ids ):
+            for result in self._score_batch(batch_ids, batch_texts):
+                yield result
+    
+    def _score_batch(self, tweet_ids=None, texts=None):
+        feature_sets = [self.features(tokens) for tokens in tokenize_batch(texts)]
+        labels, probs = self.classifier.prob_classify_many(feature_sets)
+        return zip(tweet_ids, labels, probs.max(axis=1).tolist())
+    
+    ##
+    # Saves the trained model, the vocabulary, labels and the engine
+    # arrays, in the binary model file format
+    #
+    def save_model(self, fname=None):
+        header, arrays = self.classifier.model_arrays()
+        # tokens never contain whitespace, so a newline separates them
+        tokens = u"\n".join(self.feature_names).encode('utf-8')
+        header['tokens'] = len(self.feature_names)
+        header['hash_bits'] = self.hash_bits
+        arrays.append(('tokens',np.frombuffer(tokens,dtype=np.uint8)))
+        write_model_file(fname=fname, header=header, arrays=arrays)
+        return
+    
+    ##
+    # Loads a saved model. The engine arrays are memory mapped from the
+    # file, only the vocabulary index is built in memory.
+    #
+    def load_model(self, fname=None):
+        header, arrays = read_model_file(fname=fname)
+        self.set_hash_bits(header.get('hash_bits',0))
+        feature_names = []
+        if( header['tokens'] ):
+            feature_names = arrays['tokens'].tostring().decode('utf-8').split(u"\n")
+        self.build_vocabulary(feature_names)
+        self.classifier = NaiveBayesEngine()
+        self.classifier.load_arrays(header=header, arrays=arrays)
+        self.classifier.feature_names = self.feature_names
+        return
 
 
 
@@ -111,22 +558,296 @@ def query_date(db=None, date=None, dur=1, by_hour=False):
 
 
 
+##
+# Splits a date range into hourly or daily shards, a list of
+# (start, end) datetime pairs
+#
+def date_shards(start_dt=None, end_dt=None, by_hour=False):
+    if( by_hour ):
+        delta = timedelta(hours=1)
+    else:
+        delta = timedelta(days=1)
+    shards = []
+    current_dt = start_dt
+    while( current_dt < end_dt ):
+        next_dt = min(current_dt+delta, end_dt)
+        shards.append((current_dt,next_dt))
+        current_dt = next_dt
+    return shards
+
+
+##
+# Returns the start and end datetime of a range of weeks from the
+# WEEKS table in the constants
+#
+def week_range(weeks=None):
+    start_dt = datetime.strptime(WEEKS[str(weeks[0])][0],"%Y %m %d")
+    end_dt = datetime.strptime(WEEKS[str(weeks[1])][1],"%Y %m %d")
+    return [start_dt, end_dt]
+
+
+# Each worker process keeps its own DB connection and model
+_shard_worker = {}
+
+def _init_shard_worker(model_fname=None, db_settings=None):
+    sent = Sentiment()
+    sent.load_model(model_fname)
+    config = DBConfiguration(db_settings=db_settings)
+    _shard_worker['sentiment'] = sent
+    _shard_worker['db'] = DB(config=config)
+
+
+##
+# Scores the tweets of one shard in a worker process. The argument is
+# a (start, end, keep_scores) tuple. Returns the label counts for the
+# shard, and the individual scores if keep_scores is set.
+#
+def score_shard(shard=None):
+    start_dt, end_dt, keep_scores = shard
+    db = _shard_worker['db']
+    sent = _shard_worker['sentiment']
+    result = {'start_date':start_dt,
+              'end_date':end_dt,
+              'tweets':0,
+              'counts':{},
+              'scores':[],
+              'error':None}
+    try:
+        # (tweet_id, tweet_text) rows, no ORM objects
+        tweets = db.iter_tweet_columns_by_date_range(columns=('tweet_id','tweet_text'),
+                                                     start_date=start_dt.strftime("%Y%m%d%H%M%S"),
+                                                     end_date=end_dt.strftime("%Y%m%d%H%M%S"),
+                                                     in_order=keep_scores)
+        counts = result['counts']
+        for item in sent.score_many(tweets):
+            counts[item[1]] = counts.get(item[1],0)+1
+            result['tweets'] += 1
+            if( keep_scores ):
+                result['scores'].append(item)
+    except Exception, e:
+        result['error'] = str(e)
+    return result
+
+
+##
+# Merges the per-shard results, in date order, and totals the labels
+#
+def merge_shard_results(results=None):
+    results = sorted(results, key=lambda r: r['start_date'])
+    counts = {}
+    tweets = 0
+    errors = 0
+    for result in results:
+        tweets += result['tweets']
+        if( result['error'] ):
+            errors += 1
+        for label in result['counts']:
+            counts[label] = counts.get(label,0)+result['counts'][label]
+    return {'shards':results, 'tweets':tweets, 'counts':counts, 'errors':errors}
+
+
+##
+# Scores all of the tweets in a date range with a pool of worker
+# processes. The range is split into hourly or daily shards, each
+# worker opens its own DB connection and loads the saved model.
+#
+def score_date_range(model_fname=None, start_dt=None, end_dt=None, by_hour=False,
+                     workers=None, db_settings=None, keep_scores=False):
+    if( not workers ):
+        workers = cpu_count()
+    if( not db_settings ):
+        db_settings = DATABASE_SETTINGS['default']
+    shards = [(s,e,keep_scores) for s,e in date_shards(start_dt=start_dt,
+                                                      end_dt=end_dt,
+                                                      by_hour=by_hour)]
+    pool = Pool(processes=workers,
+                initializer=_init_shard_worker,
+                initargs=(model_fname,db_settings))
+    results = []
+    try:
+        for result in pool.imap_unordered(score_shard, shards):
+            results.append(result)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    pool.join()
+    return merge_shard_results(results)
+
+
 def score_tweets(sent=None,tweet_list=None):
-    for tweet in tweet_list:
-        score = sent.score(tweet.tweet_text)
+    # the tweets are walked twice, once to score them and once to print
+    # them, so a stream of them has to be read into a list first
+    tweet_list = list(tweet_list)
+    scores = sent.score_many(tweet_list)
+    for tweet, (tweet_id, score, prob) in izip(tweet_list, scores):
         print "%s:"%score,tweet.tweet_text.encode('utf-8')
 
 
-config = DBConfiguration(db_settings=DATABASE_SETTINGS['default'])
-db = DB(config=config)
-dt = datetime.strptime("20140227000000","%Y%m%d%H%M%S")
-day_hr0 = query_date(db=db, date=dt, dur=1, by_hour=True)
+def report_range(result=None):
+    for shard in result['shards']:
+        if( shard['error'] ):
+            print "%s: ERROR %s"%(str(shard['start_date']),shard['error'])
+        else:
+            counts = ", ".join(["%s:%d"%(k,v) for k,v in sorted(shard['counts'].items())])
+            print "%s: %6d tweets %s"%(str(shard['start_date']),shard['tweets'],counts)
+    print "Total tweets: %d"%(result['tweets'])
+    for label in sorted(result['counts']):
+        print "  %s: %d"%(label,result['counts'][label])
+    if( result['errors'] ):
+        print "Shards with errors: %d"%(result['errors'])
+
+
+def parse_date(dstr=None):
+    date = None
+    try:
+        date = datetime.strptime(dstr,"%Y%m%d")
+    except:
+        try:
+            date = datetime.strptime(dstr,"%Y%m%d%H")
+        except:
+            print "Can't parse that date."
+            date = None
+    return date
+
+
+def parse_range(r=None):
+    start = 0
+    end = 0
+    start_str = r.partition('-')[0]
+    end_str = r.partition('-')[2]
+    if( start_str ):
+        start = int(start_str)
+        end = start
+    if( end_str ):
+        end = int(end_str)
+    return [start,end]
+
+
+def parse_params(argv):
+    train = "training.csv"  # labeled training data
+    model = None            # a saved model, instead of training
+    save = None             # save the trained model
+    update = None           # more labeled data to add to the model
+    hash_bits = 0           # train with 2**hash_bits hashed features
+    dt = datetime.strptime("20140227000000","%Y%m%d%H%M%S")
+    dur = 1                 # duration, in days or hours
+    by_hour = True          # the duration is in hours
+    weeks = None            # range of weeks to score
+    workers = 0             # worker processes, 0 scores in this process
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-train"):
+            pc += 1
+            train = argv[pc]
+        if( param == "-model"):
+            pc += 1
+            model = argv[pc]
+        if( param == "-save"):
+            pc += 1
+            save = argv[pc]
+        if( param == "-update"):
+            pc += 1
+            update = argv[pc]
+        if( param == "-hash_bits"):
+            pc += 1
+            hash_bits = int(argv[pc])
+        if( param == "-date"):
+            pc += 1
+            dt = parse_date(argv[pc])
+            by_hour = False
+        if( param == "-dur"):
+            pc += 1
+            dur = int(argv[pc])
+        if( param == "-by_hour"):
+            by_hour = True
+        if( param == "-by_day"):
+            by_hour = False
+        if( param == "-week"):
+            pc += 1
+            weeks = parse_range(argv[pc])
+        if( param == "-workers"):
+            pc += 1
+            workers = int(argv[pc])
+        pc += 1
+    return {'train':train, 'model':model, 'save':save, 'update':update,
+            'hash_bits':hash_bits, 'date':dt, 'duration':dur,
+            'by_hour':by_hour, 'week':weeks, 'workers':workers }
+
+
+def usage(prog):
+    print "USAGE: %s [-train <csv> [-hash_bits <k>] | -model <fname>] [-update <csv>] [-save <fname>] [-date <date>] [-dur <n>] [-by_hour | -by_day] [-week <n>-<m>] [-workers <n>]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python explore_sentiment.py
+#   python explore_sentiment.py -train training.csv -save sentiment.model
+#   python explore_sentiment.py -model sentiment.model -update new_labels.csv -save sentiment.model
+#   python explore_sentiment.py -train big_labels.csv -hash_bits 18 -save hashed.model
+#   python explore_sentiment.py -model sentiment.model -date 20140210 -dur 7 -workers 8
+#   python explore_sentiment.py -model sentiment.model -week 0-27 -by_hour -workers 16
+
+def main(argv):
+    if( "-h" in argv or "-help" in argv ):
+        usage(argv[0])
+    params = parse_params(argv)
+
+    s = Sentiment(hash_bits=params['hash_bits'])
+    if( params['model'] ):
+        s.load_model(params['model'])
+    else:
+        s.train_csv(fname=params['train'])
+    if( params['update'] ):
+        s.update(label_data=s.iter_csv_label_data(params['update']))
+    s.top_n_features(n=30)
+    if( params['save'] ):
+        s.save_model(params['save'])
+
+    if( params['week'] ):
+        start_dt, end_dt = week_range(params['week'])
+    else:
+        if( params['by_hour'] ):
+            delta = timedelta(hours=1)
+        else:
+            delta = timedelta(days=1)
+        start_dt = params['date']
+        end_dt = start_dt + (params['duration']*delta)
 
+    if( params['workers']>0 ):
+        # the workers need a saved model to load, the -model file is
+        # only that model when no update was folded in after loading it
+        model_fname = params['save']
+        if( not model_fname and not params['update'] ):
+            model_fname = params['model']
+        tmp_fname = None
+        if( not model_fname ):
+            fd, tmp_fname = tempfile.mkstemp(suffix=".model")
+            os.close(fd)
+            s.save_model(tmp_fname)
+            model_fname = tmp_fname
+        try:
+            result = score_date_range(model_fname=model_fname,
+                                      start_dt=start_dt, end_dt=end_dt,
+                                      by_hour=params['by_hour'],
+                                      workers=params['workers'])
+        finally:
+            if( tmp_fname ):
+                os.remove(tmp_fname)
+        report_range(result)
+        return
 
-s = Sentiment()
-result = s.load_csv_label_data(fname="training.csv")
-s.new_classifier(label_data=result[0])
-s.top_n_features(n=30)
+    config = DBConfiguration(db_settings=DATABASE_SETTINGS['default'])
+    db = DB(config=config)
+    tweet_list = db.query_tweet_table_by_date_range(start_date=start_dt.strftime("%Y%m%d%H%M%S"),
+                                                    end_date=end_dt.strftime("%Y%m%d%H%M%S"),
+                                                    in_order=True)
+    score_tweets(sent=s,tweet_list=tweet_list)
+    db.close()
+    return
 
-score_tweets(sent=s,tweet_list=day_hr0['tweet_list'])
 
+if __name__ == '__main__':
+    main(sys.argv)
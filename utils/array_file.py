@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: array_file.py
+#
+#   A file of named numpy arrays that is used in place from a read-only
+#   mmap, every process that reads it shares the same physical pages.
+#   The sentiment model files and the tweet columns files are both this
+#   kind of file, each with its own magic string.
+#
+#   The file is the magic string, the length of a JSON header, the JSON
+#   header and then the arrays. Each array starts on an aligned offset.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, json, mmap, struct, shutil, tempfile
+import numpy as np
+
+ARRAY_ALIGN = 64
+
+def _aligned(n=0):
+    return ((n+ARRAY_ALIGN-1)//ARRAY_ALIGN)*ARRAY_ALIGN
+
+
+def _write_prefix(f=None, magic=None, header=None, entries=None):
+    header = dict(header)
+    header['arrays'] = entries
+    header_str = json.dumps(header)
+    prefix = magic+struct.pack("<Q",len(header_str))+header_str
+    f.write(prefix)
+    f.write("\0"*(_aligned(len(prefix))-len(prefix)))
+    return
+
+
+##
+# Writes an array file, the header is a dictionary that can be stored
+# as JSON and the arrays are a list of (name, numpy array) pairs. The
+# file is written under a temporary name and then renamed. A reader
+# never sees half of one, and a file that is mapped, like a loaded
+# model, can be written over, the mapping keeps the old file.
+#
+def write_array_file(fname=None, magic=None, header=None, arrays=None):
+    entries = []
+    offset = 0
+    for name, arr in arrays:
+        entries.append({'name':name,
+                        'dtype':arr.dtype.str,
+                        'shape':list(arr.shape),
+                        'offset':offset})
+        offset += _aligned(arr.nbytes)
+    tmp_fname = fname+".tmp"
+    f = open(tmp_fname,"wb")
+    try:
+        _write_prefix(f,magic,header,entries)
+        for name, arr in arrays:
+            data = np.ascontiguousarray(arr).tostring()
+            f.write(data)
+            f.write("\0"*(_aligned(len(data))-len(data)))
+    finally:
+        f.close()
+    os.rename(tmp_fname,fname)
+    return
+
+
+##
+# Writes an array file of one dimensional arrays a piece at a time, for
+# arrays too big to build in memory first. The arrays are a list of
+# (name, dtype) pairs. The pieces of each array are spooled to a
+# temporary file next to fname and close() writes the file, like
+# write_array_file(), once the lengths are known.
+#
+class ArrayFileWriter(object):
+    def __init__(self, fname=None, magic=None, arrays=None):
+        self.fname = fname
+        self.magic = magic
+        spool_dir = os.path.dirname(os.path.abspath(fname))
+        self.arrays = []
+        self.spools = {}
+        self.counts = {}
+        for name, dtype in arrays:
+            self.arrays.append((name,np.dtype(dtype)))
+            self.spools[name] = tempfile.TemporaryFile(dir=spool_dir)
+            self.counts[name] = 0
+
+    ##
+    # Adds the values of arr to the end of the array name
+    #
+    def append(self, name=None, arr=None):
+        dtype = dict(self.arrays)[name]
+        arr = np.ascontiguousarray(arr,dtype=dtype)
+        self.spools[name].write(arr.tostring())
+        self.counts[name] += len(arr)
+        return
+
+    ##
+    # Writes the file with the header, under a temporary name that is
+    # then renamed, and drops the spooled pieces
+    #
+    def close(self, header=None):
+        try:
+            entries = []
+            offset = 0
+            for name, dtype in self.arrays:
+                entries.append({'name':name,
+                                'dtype':dtype.str,
+                                'shape':[self.counts[name]],
+                                'offset':offset})
+                offset += _aligned(self.counts[name]*dtype.itemsize)
+            tmp_fname = self.fname+".tmp"
+            f = open(tmp_fname,"wb")
+            try:
+                _write_prefix(f,self.magic,header,entries)
+                for name, dtype in self.arrays:
+                    spool = self.spools[name]
+                    spool.seek(0)
+                    shutil.copyfileobj(spool,f)
+                    nbytes = self.counts[name]*dtype.itemsize
+                    f.write("\0"*(_aligned(nbytes)-nbytes))
+            finally:
+                f.close()
+            os.rename(tmp_fname,self.fname)
+        finally:
+            self.abort()
+        return
+
+    ##
+    # Drops the spooled pieces without writing the file
+    #
+    def abort(self):
+        for spool in self.spools.values():
+            spool.close()
+        self.spools = {}
+        return
+
+
+##
+# Maps an array file into memory and returns the header and a dictionary
+# of read-only arrays that point into the mapped file. kind names the
+# file in the error when it doesn't start with magic.
+#
+def read_array_file(fname=None, magic=None, kind="array"):
+    f = open(fname,"rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    if( mm[:len(magic)]!=magic ):
+        mm.close()
+        raise ValueError("Not a %s file: %s"%(kind,fname))
+    start = len(magic)
+    header_len = struct.unpack("<Q",mm[start:start+8])[0]
+    header = json.loads(mm[start+8:start+8+header_len])
+    data_start = _aligned(start+8+header_len)
+    arrays = {}
+    for entry in header['arrays']:
+        dtype = np.dtype(str(entry['dtype']))
+        shape = tuple(entry['shape'])
+        count = int(np.prod(shape))
+        if( count ):
+            arr = np.frombuffer(mm, dtype=dtype, count=count,
+                                offset=data_start+entry['offset'])
+            arrays[entry['name']] = arr.reshape(shape)
+        else:
+            arrays[entry['name']] = np.zeros(shape, dtype=dtype)
+    return header, arrays
+
+
+if __name__ == '__main__':
+    print "No main()"
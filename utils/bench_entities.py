@@ -0,0 +1,227 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: bench_entities.py
+#   DATE: October, 2026
+#
+#   Microbenchmark of the single pass tweet_entities() against the old
+#   four regex version, on the labeled tweets and on a large synthetic
+#   sample of tweets with retweet prefixes, urls, hashtags and mentions.
+#   Also counts how many results are identical, and times the batch
+#   version with a pool of worker processes.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, sys, csv, time, random
+from sochi.utils.tweet_entities import tweet_entities, tweet_entities_batch, ENTITY_FIELDS
+from sochi.utils.tweet_entities import URL_PATTERN, RETWEET_PATTERN
+from sochi.utils.tweet_entities import RETWEET_USER_PATTERN, HASH_PATTERN
+from sochi.utils.tweet_entities import HASH_REPLACE_PATTERN, MENTION_PATTERN
+
+TRAINING_FNAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "twitter","training.csv")
+
+
+##
+# The original tweet_entities(), four findall passes and a replace of
+# every match
+#
+def old_tweet_entities(tweet_text=None, thresh=10):
+    result = {'is_retweet':False,
+              'is_short':False,
+              'is_whitespace':False,
+              'retweet_prefix':None,
+              'hashes':[],
+              'mentions':[],
+              'urls':[],
+              'guessed_retweet_from_user_name':None,
+              'fixed_tweet_text':None}
+    matched_rts = RETWEET_PATTERN.findall(tweet_text)
+    if( matched_rts ):
+        result['is_retweet'] = True
+        for item in matched_rts:
+            result['retweet_prefix'] = item
+            tweet_text = tweet_text.replace(item,'')
+            matched_users = RETWEET_USER_PATTERN.match(item)
+            if( matched_users and
+                (matched_users.group(1) or matched_users.group(2)) ):
+                for user in matched_users.group(1,2):
+                    if( user ):
+                        from_user = user.replace(':','')
+                        from_user = from_user.replace(';','')
+                        from_user = from_user.replace(',','')
+                        from_user = from_user.replace('.','')
+                        result['guessed_retweet_from_user_name'] = from_user
+    matched_urls = URL_PATTERN.findall(tweet_text)
+    if( matched_urls ):
+        for item in matched_urls:
+            result['urls'].append(item)
+            tweet_text = tweet_text.replace(item,'')
+    matched_hashes = HASH_PATTERN.findall(tweet_text)
+    if( matched_hashes ):
+        for item in matched_hashes:
+            hashtag = HASH_REPLACE_PATTERN.sub('',item)
+            result['hashes'].append(hashtag)
+            tweet_text = tweet_text.replace(item,'')
+    matched_mentions = MENTION_PATTERN.findall(tweet_text)
+    if( matched_mentions ):
+        for item in matched_mentions:
+            result['mentions'].append(item)
+            tweet_text = tweet_text.replace(item,'')
+    tweet_text = tweet_text.strip()
+    result['fixed_tweet_text'] = tweet_text
+    if( len(tweet_text)<thresh ):
+        result['is_short'] = True
+    if( (len(tweet_text)>0) and tweet_text.isspace() ):
+        result['is_whitespace'] = True
+    return result
+
+
+def load_texts(fname=None):
+    texts = []
+    f = open(fname,"r")
+    for rec in csv.DictReader(f,dialect="excel"):
+        texts.append((rec['tweet_text'] or "").decode('utf-8'))
+    f.close()
+    return texts
+
+
+##
+# Generates tweets that look like the Sochi collection, a mix of plain
+# words, hashtags, mentions, short urls and retweet prefixes
+#
+def synthetic_tweets(tweets=200000, seed=547):
+    rnd = random.Random(seed)
+    words = [u"the",u"games",u"skating",u"gold",u"medal",u"Russia",u"great",u"watching",
+             u"tonight",u"start",u"via",u"rt",u"ceremony",u"snow",u"hockey",u"team",
+             u"amazing",u"олимпиада",u"Olympische",u"día",u"wow!",u"so",u"good"]
+    tags = [u"#Sochi2014",u"#sochi",u"#Sochi",u"#olympics",u"#WeAreTeamUSA",u"#hockey",
+            u"#Сочи2014",u"#gold!",u"#TeamCanada"]
+    users = [u"@NBCOlympics",u"@Sochi2014",u"@usahockey",u"@jonny",u"@bob_s:",u"@CBCOlympics"]
+    texts = []
+    for i in xrange(tweets):
+        toks = []
+        r = rnd.random()
+        if( r<0.3 ):
+            toks.append(u"RT %s"%(rnd.choice(users)))
+        elif( r<0.35 ):
+            toks.append(u"via %s"%(rnd.choice(users)))
+        for j in xrange(rnd.randint(4,16)):
+            r = rnd.random()
+            if( r<0.15 ):
+                toks.append(rnd.choice(tags))
+            elif( r<0.22 ):
+                toks.append(rnd.choice(users))
+            elif( r<0.27 ):
+                toks.append(u"http://t.co/%07x"%(rnd.randint(0,1<<28)))
+            else:
+                toks.append(rnd.choice(words))
+        texts.append(u" ".join(toks))
+    return texts
+
+
+def timed(name=None, func=None, texts=None):
+    start = time.time()
+    result = [func(tweet_text=t) for t in texts]
+    secs = time.time()-start
+    print "  %-30s %9d tweets %8.3fs %8.2f us/tweet"%(name,len(texts),secs,
+                                                   (secs/max(len(texts),1))*1000000.0)
+    return result
+
+
+##
+# Counts the identical results. The old version took every match out
+# with str.replace, which also cut a shorter entity out of a longer one
+# ("#sochi" out of "#sochi2014" left "2014" in the text), so those
+# tweets are counted separately.
+#
+def compare(old=None, new=None):
+    same = 0
+    text_only = 0
+    for a,b in zip(old,new):
+        if( a==b ):
+            same += 1
+        else:
+            a = dict(a)
+            b = dict(b)
+            for key in ['fixed_tweet_text','is_short']:
+                del a[key]
+                del b[key]
+            if( a==b ):
+                text_only += 1
+    print "  identical: %d of %d, fixed_tweet_text differs only: %d"%(same,len(old),text_only)
+    return
+
+
+def bench(name=None, texts=None):
+    print "%s: %d tweets"%(name,len(texts))
+    old = timed("old tweet_entities",old_tweet_entities,texts)
+    new = timed("single pass tweet_entities",tweet_entities,texts)
+    compare(old,new)
+    return
+
+
+##
+# Times tweet_entities_batch() in this process and with a pool of
+# workers, both keep the default fields
+#
+def bench_batch(texts=None, workers=0):
+    print "batch: %d tweets"%(len(texts))
+    expected = [tuple([r[f] for f in ENTITY_FIELDS]) for r in map(tweet_entities,texts)]
+    for w in [1,workers]:
+        start = time.time()
+        result = tweet_entities_batch(texts,workers=w)
+        secs = time.time()-start
+        print "  %-30s %9d tweets %8.3fs %8.2f us/tweet"%("tweet_entities_batch workers=%d"%(w),
+                                            len(texts),secs,(secs/max(len(texts),1))*1000000.0)
+        if( result!=expected ):
+            print "  batch results differ!"
+    return
+
+
+def parse_params(argv):
+    fname = TRAINING_FNAME
+    tweets = 200000
+    workers = 0
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-file"):
+            pc += 1
+            fname = argv[pc]
+        if( param == "-tweets"):
+            pc += 1
+            tweets = int(argv[pc])
+        if( param == "-workers"):
+            pc += 1
+            workers = int(argv[pc])
+        pc += 1
+    return {'file':fname, 'tweets':tweets, 'workers':workers }
+
+
+def usage(prog):
+    print "USAGE: %s [-file <tweets.csv>] [-tweets <n>] [-workers <n>]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python bench_entities.py
+#   python bench_entities.py -file labeled.csv -tweets 1000000
+#   python bench_entities.py -tweets 1000000 -workers 8
+
+def main(argv):
+    if( "-h" in argv or "-help" in argv ):
+        usage(argv[0])
+    params = parse_params(argv)
+    bench(os.path.basename(params['file']),load_texts(fname=params['file']))
+    if( params['tweets']>0 ):
+        texts = synthetic_tweets(tweets=params['tweets'])
+        bench("synthetic",texts)
+        bench_batch(texts,workers=params['workers'])
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
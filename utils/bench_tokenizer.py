@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: bench_tokenizer.py
+#   DATE: October, 2026
+#
+#   Microbenchmark of the shared tokenizer against the old remove_stops
+#   followed by a split, the way the sentiment features used to be made.
+#   Also times loading the stop word packs and lookups in the frozen
+#   packs against the old STOPLIST dictionary.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import os, sys, csv, time
+from sochi.utils.stop_words import remove_stops, get_stoplist, stop_languages
+from sochi.utils.tokenizer import tokenize, tokenize_batch
+
+TRAINING_FNAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "twitter","training.csv")
+
+# The old STOPLIST was a dictionary literal of word:1 entries
+OLD_STOPLIST = dict.fromkeys(get_stoplist("en"),1)
+
+
+##
+# The original stop word removal, lines split on newlines and words
+# split on single spaces
+#
+def old_remove_stops(text=None):
+    new_text = ""
+    nt2 = []
+    text_list = text.split("\n")
+    for line in text_list:
+        word_list = line.split(' ')
+        l2 = []
+        for w in word_list:
+            wlower = w.lower()
+            if( not wlower in OLD_STOPLIST ):
+                l2.append(w)
+        if( l2 ):
+            new_line = u" ".join(l2)
+            nt2.append(new_line)
+    if( len(nt2)==0 ):
+        new_text = ""
+    elif( len(nt2)==1 ):
+        new_text = nt2[0]
+    else:
+        new_text = u"\n".join(nt2)
+    return new_text
+
+
+def load_texts(fname=None, repeat=1):
+    texts = []
+    f = open(fname,"r")
+    for rec in csv.DictReader(f,dialect="excel"):
+        texts.append((rec['tweet_text'] or "").decode('utf-8'))
+    f.close()
+    return texts*repeat
+
+
+def timed(name=None, func=None, texts=None):
+    start = time.time()
+    result = func(texts)
+    secs = time.time()-start
+    print "  %-30s %9d texts %8.3fs %8.2f us/text"%(name,len(texts),secs,
+                                                 (secs/max(len(texts),1))*1000000.0)
+    return result
+
+
+##
+# Times loading each stop word pack from disk and lookups of every word
+# of the texts in the frozen English pack and the old dictionary
+#
+def bench_stops(texts=None):
+    from sochi.utils import stop_words
+    for lang in stop_languages():
+        stop_words._stop_packs.pop(lang,None)
+        start = time.time()
+        stops = get_stoplist(lang)
+        print "  load %-25s %9d words %8.3fms"%(lang,len(stops),(time.time()-start)*1000.0)
+    words = [w.lower() for t in texts for w in t.split()]
+    for name,stops in [("dict lookups",OLD_STOPLIST),("frozenset lookups",get_stoplist("en"))]:
+        start = time.time()
+        hits = len([1 for w in words if w in stops])
+        secs = time.time()-start
+        print "  %-30s %9d words %8.3fs %8.3f us/word (%d stops)"%(name,len(words),secs,
+                                                    (secs/max(len(words),1))*1000000.0,hits)
+    return
+
+
+def parse_params(argv):
+    fname = TRAINING_FNAME
+    repeat = 1000
+    pc = 1
+    while( pc < len(argv) ):
+        param = argv[pc]
+        if( param == "-file"):
+            pc += 1
+            fname = argv[pc]
+        if( param == "-repeat"):
+            pc += 1
+            repeat = int(argv[pc])
+        pc += 1
+    return {'file':fname, 'repeat':repeat }
+
+
+def usage(prog):
+    print "USAGE: %s [-file <tweets.csv>] [-repeat <n>]"%(prog)
+    sys.exit(0)
+
+
+# Some simple examples of using this at the command line
+#
+#   python bench_tokenizer.py
+#   python bench_tokenizer.py -file labeled.csv -repeat 1
+
+def main(argv):
+    if( "-h" in argv or "-help" in argv ):
+        usage(argv[0])
+    params = parse_params(argv)
+    texts = load_texts(fname=params['file'],repeat=params['repeat'])
+    print "Tokenizing %d texts"%(len(texts))
+    old = timed("old remove_stops + split",
+                lambda ts: [old_remove_stops(t).split() for t in ts], texts)
+    new = timed("tokenize",
+                lambda ts: [tokenize(t) for t in ts], texts)
+    batch = timed("tokenize_batch", tokenize_batch, texts)
+    timed("tokenize_batch lower", lambda ts: tokenize_batch(ts,lower=True), texts)
+    timed("old remove_stops",
+                lambda ts: [old_remove_stops(t) for t in ts], texts)
+    timed("remove_stops",
+                lambda ts: [remove_stops(t) for t in ts], texts)
+    same = len([1 for a,b,c in zip(old,new,batch) if a==b==c])
+    print "  same tokens: %d of %d"%(same,len(texts))
+    print "Stop word packs"
+    bench_stops(texts)
+    return
+
+
+if __name__ == '__main__':
+    main(sys.argv)
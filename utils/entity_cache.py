@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: entity_cache.py
+#
+#   A persistent cache of tweet_entities() results keyed by tweet_id.
+#   The entities are kept in a local SQLite file, one row per tweet with
+#   the fields packed by marshal, and the recently used ones are also
+#   kept in memory in a least recently used dictionary. Running several
+#   analyses over the same period only parses each tweet once.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+import marshal, sqlite3
+from collections import OrderedDict
+from sochi.utils.tweet_entities import tweet_entities, tweet_entities_batch
+
+# The tweet_entities() fields that are cached, the ones that don't
+# depend on the short tweet threshold. Changing this list needs a new
+# CACHE_FORMAT, old cache files are then cleared when opened.
+CACHE_FIELDS = ('hashes','mentions','urls','is_retweet','retweet_prefix',
+                'guessed_retweet_from_user_name')
+CACHE_FORMAT = "1"
+
+# SQLite allows 999 parameters in a statement
+SQL_BATCH_SIZE = 500
+
+
+class EntityCache(object):
+    def __init__(self, fname=None, memory_size=100000):
+        self.fname = fname
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(fname)
+        # this is a cache, if a crash loses the last writes they are
+        # recomputed, so don't wait for the disk
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tweet_entities "
+                          "(tweet_id INTEGER PRIMARY KEY, entities BLOB)")
+        row = self.conn.execute("SELECT value FROM cache_meta WHERE key='format'").fetchone()
+        if( not row or row[0]!=CACHE_FORMAT ):
+            self.conn.execute("DELETE FROM tweet_entities")
+            self.conn.execute("INSERT OR REPLACE INTO cache_meta VALUES ('format',?)",(CACHE_FORMAT,))
+        self.conn.commit()
+
+    def close(self):
+        if( self.conn ):
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    ##
+    # The number of tweets in the cache file
+    #
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM tweet_entities").fetchone()[0]
+
+    ##
+    # Adds a tuple of CACHE_FIELDS values to the memory layer, dropping
+    # the least recently used entries once it is full
+    #
+    def _remember(self, tweet_id=None, values=None):
+        memory = self.memory
+        if( tweet_id in memory ):
+            del memory[tweet_id]
+        memory[tweet_id] = values
+        while( len(memory)>self.memory_size ):
+            memory.popitem(last=False)
+
+    def _recall(self, tweet_id=None):
+        values = self.memory.pop(tweet_id,None)
+        if( values is not None ):
+            self.memory[tweet_id] = values
+        return values
+
+    ##
+    # Returns the cached entities of a tweet as a dictionary of the
+    # CACHE_FIELDS, or None if the tweet has not been seen
+    #
+    def get(self, tweet_id=None):
+        values = self._recall(tweet_id)
+        if( values is not None ):
+            self.memory_hits += 1
+            return dict(zip(CACHE_FIELDS,values))
+        row = self.conn.execute("SELECT entities FROM tweet_entities WHERE tweet_id=?",
+                                (tweet_id,)).fetchone()
+        if( row is None ):
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        values = marshal.loads(str(row[0]))
+        self._remember(tweet_id,values)
+        return dict(zip(CACHE_FIELDS,values))
+
+    ##
+    # Stores the entities of a tweet, a tweet_entities() result
+    #
+    def put(self, tweet_id=None, entities=None):
+        values = tuple([entities[field] for field in CACHE_FIELDS])
+        self.conn.execute("INSERT OR REPLACE INTO tweet_entities VALUES (?,?)",
+                          (tweet_id,buffer(marshal.dumps(values))))
+        self._remember(tweet_id,values)
+        return
+
+    ##
+    # The entities of one tweet, from the cache if it is there, otherwise
+    # extracted and cached
+    #
+    def entities(self, tweet_id=None, tweet_text=None):
+        result = self.get(tweet_id)
+        if( result is None ):
+            result = tweet_entities(tweet_text=(tweet_text or u""))
+            self.put(tweet_id,result)
+        return result
+
+    ##
+    # Like tweet_entities_batch() for a list of (tweet_id, tweet_text)
+    # pairs, or tweet objects or rows with those attributes. The memory
+    # layer is checked first, then the file with one query per
+    # SQL_BATCH_SIZE tweets, and only the rest are extracted (with workers
+    # processes) and written back in one transaction. Returns one entry per tweet,
+    # in order, with the named fields, which must be CACHE_FIELDS.
+    #
+    def entities_batch(self, tweets=None, workers=1, fields=CACHE_FIELDS):
+        if( isinstance(fields,basestring) ):
+            pick = CACHE_FIELDS.index(fields)
+        else:
+            pick = [CACHE_FIELDS.index(field) for field in fields]
+        ids = []
+        texts = {}
+        for tweet in tweets:
+            # the rows of the column queries are tuples too, so look for
+            # the attributes first
+            if( hasattr(tweet,'tweet_text') ):
+                tweet_id, tweet_text = tweet.tweet_id, tweet.tweet_text
+            else:
+                tweet_id, tweet_text = tweet
+            ids.append(tweet_id)
+            texts[tweet_id] = tweet_text
+        found = {}
+        missing = []
+        for tweet_id in texts:
+            values = self._recall(tweet_id)
+            if( values is None ):
+                missing.append(tweet_id)
+            else:
+                found[tweet_id] = values
+        self.memory_hits += len(found)
+        unseen = []
+        for i in xrange(0,len(missing),SQL_BATCH_SIZE):
+            chunk = missing[i:i+SQL_BATCH_SIZE]
+            sql = "SELECT tweet_id, entities FROM tweet_entities WHERE tweet_id IN (%s)"%(
+                  ",".join(["?"]*len(chunk)))
+            rows = dict(self.conn.execute(sql,chunk).fetchall())
+            for tweet_id in chunk:
+                blob = rows.get(tweet_id)
+                if( blob is None ):
+                    unseen.append(tweet_id)
+                else:
+                    values = marshal.loads(str(blob))
+                    found[tweet_id] = values
+                    self._remember(tweet_id,values)
+        self.disk_hits += len(missing)-len(unseen)
+        self.misses += len(unseen)
+        if( unseen ):
+            extracted = tweet_entities_batch([texts[tweet_id] for tweet_id in unseen],
+                                             workers=workers, fields=CACHE_FIELDS)
+            rows = []
+            for tweet_id, values in zip(unseen,extracted):
+                found[tweet_id] = values
+                self._remember(tweet_id,values)
+                rows.append((tweet_id,buffer(marshal.dumps(values))))
+            self.conn.executemany("INSERT OR REPLACE INTO tweet_entities VALUES (?,?)",rows)
+            self.conn.commit()
+        if( isinstance(pick,int) ):
+            return [found[tweet_id][pick] for tweet_id in ids]
+        return [tuple([found[tweet_id][p] for p in pick]) for tweet_id in ids]
+
+    def stats(self):
+        return {'memory_hits':self.memory_hits, 'disk_hits':self.disk_hits,
+                'misses':self.misses, 'in_memory':len(self.memory)}
+
+
+if __name__ == '__main__':
+    print "No main()"
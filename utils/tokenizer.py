@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#   FILE: tokenizer.py
+#
+#   The tokenizer shared by the stop word removal and the sentiment
+#   features. Splits text on whitespace, checks the lower case form of
+#   each word against the stop words and emits the kept words, all in
+#   one pass. There is a batch version for lists of strings.
+#
+#   Copyright by Author. All rights reserved. Not for reuse without
+#   express permissions.
+#
+
+# The stop words module is only imported when a tokenizer is first
+# used, it imports this module
+_stop_words = None
+
+##
+# Returns the stop words for the current default language, see
+# stop_words.set_stop_language()
+#
+def default_stops():
+    global _stop_words
+    if( _stop_words is None ):
+        from sochi.utils import stop_words
+        _stop_words = stop_words
+    return _stop_words.get_stoplist()
+
+
+##
+# Returns the list of tokens in the text that are not stop words. The
+# tokens keep their case unless lower is True.
+#
+def tokenize(text=None, stops=None, lower=False):
+    if( not text ):
+        return []
+    if( stops is None ):
+        stops = default_stops()
+    if( lower ):
+        return [w for w in text.lower().split() if w not in stops]
+    return [w for w in text.split() if w.lower() not in stops]
+
+
+##
+# Tokenizes a list (or any iterable) of strings, returns a list with
+# one token list per string
+#
+def tokenize_batch(texts=None, stops=None, lower=False):
+    if( stops is None ):
+        stops = default_stops()
+    result = []
+    append = result.append
+    if( lower ):
+        for text in texts:
+            if( text ):
+                append([w for w in text.lower().split() if w not in stops])
+            else:
+                append([])
+    else:
+        for text in texts:
+            if( text ):
+                append([w for w in text.split() if w.lower() not in stops])
+            else:
+                append([])
+    return result
+
+
+if __name__ == '__main__':
+    print "No main()"